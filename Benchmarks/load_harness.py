@@ -0,0 +1,527 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Offline load harness of Skype -> spool -> MessageSendingManager -> Telegram pipeline.
+Skype, Telegram Bot API, translator and PostgreSQL are replaced with local stand-ins:
+
+    * fake skpy event loop which feeds raw Skype events to SkypeBot.onEvent
+    * mock Telegram Bot API HTTP server (telegram_api_url in config)
+    * stub translator with configurable latency
+    * in-memory database which answers named statements behind DatabaseManager connections pool
+
+    python Benchmarks/load_harness.py --messages 2000 --chats 20 --members 10 --mentions 3 --producers 4
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlsplit, parse_qsl
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BOT_SKYPE_ID = 'live:.cid.harnessbot'
+TG_TOKEN = '123456:harness'
+MARKER = re.compile(r'#(\d+)#')
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Offline load test of Skype to Telegram pipeline')
+    parser.add_argument('--messages', type=int, default=1000, help='number of Skype messages to send')
+    parser.add_argument('--chats', type=int, default=10, help='number of Skype group chats')
+    parser.add_argument('--members', type=int, default=10, help='number of members in every chat including bot')
+    parser.add_argument('--mentions', type=int, default=3, help='number of users mentioned in every message')
+    parser.add_argument('--producers', type=int, default=1, help='number of threads feeding Skype events')
+    parser.add_argument('--rate', type=float, default=0, help='max number of Skype messages per second, 0 - no limit')
+    parser.add_argument('--telegram-latency', type=float, default=0.005, help='mock Telegram API latency in seconds')
+    parser.add_argument('--translator-latency', type=float, default=0.05, help='stub translator latency in seconds')
+    parser.add_argument('--telegram-rate', type=float, default=1000, help='telegram_global_rate in config')
+    parser.add_argument('--telegram-chat-rate', type=float, default=100, help='telegram_chat_rate in config')
+    parser.add_argument('--delivery-workers', type=int, default=8)
+    parser.add_argument('--telegram-senders', type=int, default=8)
+    parser.add_argument('--skype-event-workers', type=int, default=8)
+    parser.add_argument('--db-pool-size', type=int, default=10)
+    parser.add_argument('--timeout', type=float, default=120, help='max time to wait for delivery in seconds')
+    parser.add_argument('--json', help='file to write report to')
+    return parser.parse_args()
+
+def get_free_udp_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def install_config(args, work_dir:str, telegram_port:int) -> types.ModuleType:
+    """
+    this function installs fake config module used by bots instead of config.py
+    """
+    config = types.ModuleType('config')
+    config.skype_bot_login = 'harness'
+    config.skype_bot_password = 'harness'
+    config.tg_bot_token = TG_TOKEN
+    config.db_name = 'harness'
+    config.db_user_password = 'harness'
+    config.db_pool_max_size = args.db_pool_size
+    config.message_storage_path = os.path.join(work_dir, 'spool') + os.sep
+    config.message_transport = 'socket'
+    config.message_transport_port = get_free_udp_port()
+    config.telegram_api_url = 'http://127.0.0.1:{0}/bot{{0}}/{{1}}'.format(telegram_port)
+    config.telegram_global_rate = args.telegram_rate
+    config.telegram_chat_rate = args.telegram_chat_rate
+    config.telegram_chat_burst = max(1, args.telegram_chat_rate)
+    config.telegram_senders = args.telegram_senders
+    config.delivery_workers = args.delivery_workers
+    config.skype_event_workers = args.skype_event_workers
+    config.subscription_index_refresh_period = 3600
+    sys.modules['config'] = config
+    return config
+
+class FakeDatabase:
+    """
+    This class represents in-memory tables which answer named statements used by bots
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.skype_chats = {}  # chat link -> (id, chat link, language, chat name)
+        self.tg_chats = {}  # chat link -> (id, chat link, language)
+        self.subscriptions = []  # (record id, chat link, skype id, tg id, is in blacklist)
+        self.calls = {}
+
+    def execute(self, name:str, params:tuple) -> list:
+        handler = getattr(self, 'do_' + name, None)
+        if handler is None:
+            raise NotImplementedError('Statement {0} is not supported by fake database'.format(name))
+        with self.lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+            return handler(*params)
+
+    def do_select_skype_chats(self):
+        return list(self.skype_chats.values())
+
+    def do_select_tg_chats(self):
+        return list(self.tg_chats.values())
+
+    def do_select_skype_chat(self, chat_link):
+        return [self.skype_chats[chat_link]] if chat_link in self.skype_chats else []
+
+    def do_select_tg_chat(self, chat_link):
+        return [self.tg_chats[chat_link]] if chat_link in self.tg_chats else []
+
+    def do_insert_skype_chat(self, chat_link, chat_name):
+        self.skype_chats[chat_link] = (len(self.skype_chats) + 1, chat_link, 'en', chat_name)
+
+    def do_insert_tg_chat(self, chat_link):
+        self.tg_chats[chat_link] = (len(self.tg_chats) + 1, chat_link, 'en')
+
+    def do_update_skype_chat_language(self, language, chat_link):
+        row = self.skype_chats[chat_link]
+        self.skype_chats[chat_link] = (row[0], row[1], language, row[3])
+
+    def do_update_tg_chat_language(self, language, chat_link):
+        row = self.tg_chats[chat_link]
+        self.tg_chats[chat_link] = (row[0], row[1], language)
+
+    def do_select_all_subscriptions(self):
+        return list(self.subscriptions)
+
+class FakeCursor:
+    """
+    This class represents psycopg2 cursor stand-in which runs statements on fake database
+    """
+    def __init__(self, db:FakeDatabase):
+        self.db = db
+        self.rows = []
+        self.itersize = 1000
+
+    def execute(self, query:str, params=None):
+        from Helpers.Statements import statements
+        if query.startswith('prepare '):
+            return
+        if query.startswith('execute '):
+            name = query[len('execute '):].split('(')[0].strip()
+            self.rows = self.db.execute(name, tuple(params or ()))
+            return
+        # server side cursor query
+        for name, statement in statements.items():
+            if statement.get_cursor_query() == query:
+                values = tuple(params['p' + str(i + 1)] for i in range(statement.params_count))
+                self.rows = self.db.execute(name, values)
+                return
+        raise NotImplementedError('Query is not supported by fake database: ' + query)
+
+    def fetchall(self):
+        return self.rows
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+class FakeConnection:
+    """
+    This class represents psycopg2 connection stand-in which is given to DatabaseManager pool
+    """
+    def __init__(self, db:FakeDatabase):
+        import psycopg2.extensions
+        self.db = db
+        self.closed = 0
+        self.info = types.SimpleNamespace(transaction_status=psycopg2.extensions.TRANSACTION_STATUS_IDLE)
+
+    def cursor(self, name=None):
+        return FakeCursor(self.db)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.closed = 1
+
+class FakeSkypeChat:
+    """
+    This class represents skpy chat stand-in which counts bot answers
+    """
+    def __init__(self, chat_id:str, user_ids:tuple, stats):
+        self.id = chat_id
+        self.userIds = user_ids
+        self.stats = stats
+
+    def sendMsg(self, content, rich=False):
+        self.stats.count('skype_messages_sent')
+
+class FakeSkypeChats:
+    """
+    This class represents skpy chats container stand-in
+    """
+    def __init__(self, chats:dict, stats):
+        self.chats = chats
+        self.stats = stats
+
+    def __getitem__(self, chat_id):
+        return self.chats[chat_id]
+
+    def chat(self, chat_id):
+        self.stats.count('skype_chat_requests')
+        return self.chats[chat_id]
+
+class TelegramApiHandler(BaseHTTPRequestHandler):
+    """
+    This class represents handler of mock Telegram Bot API requests
+    """
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately, so Nagle's algorithm would delay every response
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.handle_api_call()
+
+    def do_POST(self):
+        self.handle_api_call()
+
+    def handle_api_call(self):
+        url = urlsplit(self.path)
+        method = url.path.rsplit('/', 1)[-1]
+        params = dict(parse_qsl(url.query))
+        length = int(self.headers.get('Content-Length', 0))
+        body = self.rfile.read(length) if length else b''
+        if body and self.headers.get('Content-Type', '').startswith('application/x-www-form-urlencoded'):
+            params.update(parse_qsl(body.decode('utf-8')))
+        result = self.server.api.call(method, params)
+        data = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockTelegramApi:
+    """
+    This class represents mock Telegram Bot API server
+    """
+    def __init__(self, latency:float, stats):
+        self.latency = latency
+        self.stats = stats
+        self.message_id = 0
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), TelegramApiHandler)
+        self.server.daemon_threads = True
+        self.server.api = self
+        self.port = self.server.server_port
+        threading.Thread(target=self.server.serve_forever, name='mock-telegram', daemon=True).start()
+
+    def call(self, method:str, params:dict):
+        self.stats.count('telegram_' + method)
+        if self.latency:
+            time.sleep(self.latency)
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Harness bot', 'username': 'harness_bot'}
+        if method == 'sendMessage':
+            with self.lock:
+                self.message_id += 1
+                message_id = self.message_id
+            text = params.get('text', '')
+            self.stats.on_delivery(text)
+            return {'message_id': message_id, 'date': int(time.time()), 'text': text,
+                    'chat': {'id': int(params.get('chat_id', 0)), 'type': 'private'}}
+        if method == 'getChatMembersCount' or method == 'getChatMemberCount':
+            return 2
+        return True
+
+class StubTranslator:
+    """
+    This class represents deep_translator GoogleTranslator stand-in with configurable latency
+    """
+    latency = 0.0
+    stats = None
+
+    def __init__(self, source='auto', target='en', **kwargs):
+        self.source = source
+        self.target = target
+
+    def translate(self, text, **kwargs):
+        StubTranslator.stats.count('translator_calls')
+        if StubTranslator.latency:
+            time.sleep(StubTranslator.latency)
+        return text if self.source == self.target else '[{0}] {1}'.format(self.target, text)
+
+class LoadStats:
+    """
+    This class represents collector of end-to-end latencies and counters
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.sent = {}  # message number -> time it was given to SkypeBot
+        self.expected = {}  # message number -> number of Telegram recipients
+        self.delivered = {}  # message number -> number of Telegram messages received
+        self.latencies = []
+        self.first_sent = None
+        self.last_done = None
+        self.all_done = threading.Event()
+        self.total = 0
+
+    def count(self, name:str):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + 1
+
+    def on_sent(self, number:int, recipients:int):
+        now = time.perf_counter()
+        with self.lock:
+            if self.first_sent is None:
+                self.first_sent = now
+            self.sent[number] = now
+            self.expected[number] = recipients
+
+    def on_delivery(self, text:str):
+        match = MARKER.search(text)
+        if match is None:
+            return
+        number = int(match.group(1))
+        now = time.perf_counter()
+        with self.lock:
+            self.delivered[number] = self.delivered.get(number, 0) + 1
+            if self.delivered[number] == self.expected.get(number):
+                self.latencies.append(now - self.sent[number])
+                self.last_done = now
+                if len(self.latencies) == self.total:
+                    self.all_done.set()
+
+class ResourceMonitor:
+    """
+    This class represents sampler of process threads count
+    """
+    def __init__(self, period:float=0.1):
+        self.period = period
+        self.max_threads = threading.active_count()
+        self.stopped = threading.Event()
+        threading.Thread(target=self.run, name='resource-monitor', daemon=True).start()
+
+    def run(self):
+        while not self.stopped.wait(self.period):
+            self.max_threads = max(self.max_threads, threading.active_count())
+
+def get_max_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not available on Windows
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == 'darwin' else rss / 1024
+
+def percentile(values:list, p:float) -> float:
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+def create_raw_event(number:int, chat_id:str, chat_name:str, sender:str, mentioned:list) -> dict:
+    """
+    this function creates raw Skype event of new group message mentioning bot and users
+    """
+    mentions = ' '.join('<at id="8:{0}">{0}</at>'.format(user_id) for user_id in mentioned)
+    content = '<at id="8:{0}">Bot</at> {1} load message #{2}#'.format(BOT_SKYPE_ID, mentions, number)
+    return {'id': number, 'type': 'EventMessage', 'time': '2024-01-01T00:00:00Z', 'resourceType': 'NewMessage',
+            'resource': {'id': str(number), 'messagetype': 'RichText', 'content': content,
+                         'from': 'https://harness/v1/users/ME/contacts/8:' + sender,
+                         'conversationLink': 'https://harness/v1/users/ME/conversations/' + chat_id,
+                         'imdisplayname': sender, 'threadtopic': chat_name,
+                         'composetime': '2024-01-01T00:00:00.000Z', 'originalarrivaltime': '2024-01-01T00:00:00.000Z'}}
+
+def main():
+    args = parse_args()
+    assert (args.members >= 3 and 1 <= args.mentions <= args.members - 2)
+    work_dir = tempfile.mkdtemp(prefix='load_harness_')
+    bots_dir = os.path.join(work_dir, 'bots')
+    os.makedirs(bots_dir)
+    # bots read commands and write logs in parent directory of working directory
+    with open(os.path.join(work_dir, 'skype_bot_commands.txt'), 'w') as f:
+        json.dump({'!about': 'I am {0}', '!commands': '!about !link', '!language(uk)': '', '!language(en)': '',
+                   '!link': ''}, f)
+    with open(os.path.join(work_dir, 'tg_bot_commands.txt'), 'w') as f:
+        json.dump({'start': 'I am {0}', 'default': 'Choose option', 'help': 'Help'}, f)
+    os.chdir(bots_dir)
+
+    stats = LoadStats()
+    stats.total = args.messages
+    telegram = MockTelegramApi(args.telegram_latency, stats)
+    install_config(args, work_dir, telegram.port)
+
+    # MessageSendingManager is imported before bots because of circular import
+    from Helpers import MessageSendingManager
+    from Helpers.DatabaseManager import DatabaseManager
+    from Helpers.Metrics import registry, Histogram
+    from Bots import Bot
+    from Bots.TelegramBot import TelegramBot
+    from Bots.SkypeBot import SkypeBot
+    from skpy import SkypeEventLoop, SkypeEvent
+
+    db = FakeDatabase()
+    DatabaseManager.connect = lambda self: FakeConnection(db)
+    StubTranslator.latency = args.translator_latency
+    StubTranslator.stats = stats
+    Bot.GoogleTranslator = StubTranslator
+
+    chats = {}
+    tg_id = 100000
+    record_id = 0
+    for c in range(args.chats):
+        chat_id = '19:harness{0}@thread.skype'.format(c)
+        members = tuple([BOT_SKYPE_ID] + ['live:.cid.user{0}x{1}'.format(c, m) for m in range(args.members - 1)])
+        chats[chat_id] = FakeSkypeChat(chat_id, members, stats)
+        db.skype_chats[chat_id] = (c + 1, chat_id, 'en', 'Harness chat {0}'.format(c))
+        for skype_id in members[1:]:
+            tg_id += 1
+            record_id += 1
+            db.subscriptions.append((record_id, chat_id, skype_id, tg_id, 'n'))
+            db.tg_chats[str(tg_id)] = (record_id, str(tg_id), 'uk' if tg_id % 2 else 'en')
+
+    class FakeSkypeEventLoop(SkypeEventLoop):
+        """
+        This class represents skpy event loop stand-in which doesn't connect to Skype
+        """
+        user = types.SimpleNamespace(name='Harness bot')
+
+        def __init__(self, *args, **kwargs):
+            self.conn = types.SimpleNamespace(userId=BOT_SKYPE_ID)
+            self.chats = FakeSkypeChats(chats, stats)
+            self.autoAck = False
+
+    class HarnessSkypeBot(SkypeBot, FakeSkypeEventLoop):
+        pass
+
+    telegram_bot = TelegramBot()
+    skype_bot = HarnessSkypeBot()
+    print('bots created, sending {0} messages'.format(args.messages))
+
+    chat_ids = list(chats.keys())
+    next_number = [0]
+    number_lock = threading.Lock()
+    interval = args.producers / args.rate if args.rate > 0 else 0
+
+    def produce():
+        next_time = time.perf_counter()
+        while True:
+            with number_lock:
+                number = next_number[0]
+                if number >= args.messages:
+                    return
+                next_number[0] += 1
+            chat = chats[chat_ids[number % len(chat_ids)]]
+            members = chat.userIds[1:]
+            sender = members[number % len(members)]
+            others = [user_id for user_id in members if user_id != sender]
+            start = number % len(others)
+            mentioned = [others[(start + i) % len(others)] for i in range(args.mentions)]
+            event = SkypeEvent.fromRaw(skype_bot, create_raw_event(number, chat.id, 'Harness chat', sender, mentioned))
+            stats.on_sent(number, len(mentioned))
+            skype_bot.onEvent(event)
+            if interval:
+                next_time += interval
+                time.sleep(max(0.0, next_time - time.perf_counter()))
+
+    monitor = ResourceMonitor()
+    cpu_start = time.process_time()
+    producers = [threading.Thread(target=produce, name='producer-{0}'.format(i)) for i in range(args.producers)]
+    for producer in producers:
+        producer.start()
+    for producer in producers:
+        producer.join()
+    completed = stats.all_done.wait(args.timeout)
+    cpu_time = time.process_time() - cpu_start
+    monitor.stopped.set()
+
+    wall_time = (stats.last_done or time.perf_counter()) - (stats.first_sent or time.perf_counter())
+    done = len(stats.latencies)
+    report = {
+        'messages': args.messages,
+        'completed': done,
+        'timed_out': not completed,
+        'deliveries': sum(stats.delivered.values()),
+        'wall_seconds': round(wall_time, 3),
+        'messages_per_second': round(done / wall_time, 1) if wall_time > 0 else None,
+        'deliveries_per_second': round(sum(stats.delivered.values()) / wall_time, 1) if wall_time > 0 else None,
+        'latency_ms': {name: round(percentile(stats.latencies, p) * 1000, 1)
+                       for name, p in (('p50', 50), ('p90', 90), ('p99', 99), ('max', 100))},
+        'cpu_seconds': round(cpu_time, 2),
+        'max_threads': monitor.max_threads,
+        'max_rss_mb': get_max_rss_mb(),
+        'counters': dict(sorted(stats.counters.items())),
+        'db_statements': dict(sorted(db.calls.items())),
+        'metrics': {},
+    }
+    for metric in registry.collect():
+        key = metric.name + ''.join('{{{0}={1}}}'.format(k, v) for k, v in sorted(metric.labels.items()))
+        if isinstance(metric, Histogram):
+            report['metrics'][key] = {'count': metric.count, 'mean': metric.sum / metric.count if metric.count else 0,
+                                      'max': metric.max}
+        else:
+            report['metrics'][key] = metric.get_value()
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+    # bots threads never stop
+    sys.stdout.flush()
+    os.chdir(ROOT)
+    # bots threads may still write logs, so errors of removal are ignored
+    shutil.rmtree(work_dir, ignore_errors=True)
+    os._exit(0 if completed else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark and golden corpus of SkypeMessageParser.
+
+    python Benchmarks/parser_benchmark.py bench [--quick]   measure throughput and allocations
+    python Benchmarks/parser_benchmark.py check             compare parser output with golden corpus
+    python Benchmarks/parser_benchmark.py update            regenerate golden corpus from current parser
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+try:
+    import config
+except ImportError:
+    # parser doesn't use config, but its modules import it
+    sys.modules['config'] = types.ModuleType('config')
+from Helpers.SkypeMessageParser import SkypeMessageParser
+
+BOT_ID = 'live:.cid.bot0000000000'
+COMMANDS = ['!about', '!commands', '!language(uk)', '!language(en)', '!link']
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'parser_corpus.json')
+WORDS = ['hello', 'world', 'release', 'is', 'ready', 'please', 'check', 'the', 'build', 'привіт', 'тест', 'x.y',
+         'a@b.com', '<b>', '?', '!', '@', '<at']
+
+class FakeSkypeTextMsg:
+    """
+    This class represents stand-in of skpy SkypeTextMsg with fields used by parser
+    """
+    def __init__(self, plain:str, user_id:str, chat_id:str='19:benchmark@thread.skype'):
+        self.plain = plain
+        self.userId = user_id
+        self.chatId = chat_id
+        self.raw = {'imdisplayname': 'Sender', 'threadtopic': 'Benchmark chat'}
+
+class FakeSkypeChat:
+    """
+    This class represents stand-in of skpy SkypeChat with fields used by parser
+    """
+    def __init__(self, user_ids:tuple):
+        self.id = '19:benchmark@thread.skype'
+        self.userIds = user_ids
+
+def generate_case(group_size:int, message_size:int, mention_all:bool=False, with_file:bool=False,
+                  seed:int=0) -> dict:
+    """
+    this function generates synthetic chat and message
+    :param group_size: number of chat members including bot
+    :param message_size: approximate message size in bytes
+    :param mention_all: True if message mentions all chat members
+    :param with_file: True if message asks to attach file
+    :param seed: random generator seed
+    :return: dict with chat members, sender id and message text
+    """
+    rnd = random.Random(seed)
+    members = tuple([BOT_ID] + ['live:.cid.{0:012x}'.format(rnd.getrandbits(48)) for i in range(group_size - 1)])
+    sender = members[rnd.randrange(1, len(members))]
+    tokens = ['@' + BOT_ID]
+    if mention_all:
+        tokens.append('<at id="*">all</at>')
+    else:
+        for user_id in rnd.sample(members[1:], min(len(members) - 1, rnd.randint(1, 5))):
+            tokens.append('@' + user_id)
+    if with_file:
+        tokens.append('!file')
+    size = sum(len(token.encode('utf-8')) + 1 for token in tokens)
+    if size > message_size:
+        # message is too short for mentions, so it's plain chat message where bot is not mentioned
+        tokens = []
+        size = 0
+    while size < message_size:
+        word = rnd.choice(WORDS)
+        if tokens and rnd.random() < 0.02:
+            word = '@' + rnd.choice(members)
+        tokens.append(word)
+        size += len(word.encode('utf-8')) + 1
+    return {'members': list(members), 'sender': sender, 'text': ' '.join(tokens)}
+
+def parse(parser:SkypeMessageParser, case:dict, chat:FakeSkypeChat=None) -> dict:
+    """
+    this function parses case message and returns parser output as dict
+    """
+    chat = chat or FakeSkypeChat(tuple(case['members']))
+    result = parser.parse_chat_message(FakeSkypeTextMsg(case['text'], case['sender']), chat.userIds)
+    return {'should_react': result.should_react, 'error_msg': result.error_msg,
+            'command_token': result.command_token, 'msg': result.msg,
+            'mentioned_user_ids': list(result.mentioned_user_ids), 'has_attachment': result.has_attachment}
+
+def get_edge_cases() -> list[dict]:
+    """
+    this function returns hand written cases of parser rules
+    """
+    members = [BOT_ID, 'alice', 'bob', 'bobby', 'bo', 'live:.cid.1f2e']
+    texts = ['', 'hello', '!about', 'please show !commands and !link', '!language(uk)',
+             '@' + BOT_ID, ' @' + BOT_ID + ' @alice hi', '@alice @' + BOT_ID + ' hi',
+             '@' + BOT_ID + ' @bob, @bobby. @bo hi', '@' + BOT_ID + ' @bobx hi', '@' + BOT_ID + ' @alice',
+             '@' + BOT_ID + ' <at id="*">all</at> hi', '@' + BOT_ID + ' <at id="*">all</at> <at id="*">all</at> x',
+             '@' + BOT_ID + ' <at id="*">all hi', '@' + BOT_ID + ' !file @alice report',
+             '@' + BOT_ID + ' @alice !file', '@' + BOT_ID + ' @live:.cid.1f2e hi @' + BOT_ID,
+             '@' + BOT_ID + ' @sender @alice hi', '@' + BOT_ID + ' mail a@bob.com', 'x@' + BOT_ID + ' @alice hi',
+             '@' + BOT_ID + ' @alice привіт !about']
+    return [{'members': members, 'sender': 'sender', 'text': text} for text in texts]
+
+def get_corpus_cases() -> list[dict]:
+    """
+    this function returns cases stored in golden corpus
+    """
+    cases = get_edge_cases()
+    seed = 0
+    for group_size in (3, 10, 100):
+        for message_size in (10, 100, 1024):
+            for mention_all in (False, True):
+                for with_file in (False, True):
+                    seed += 1
+                    cases.append(generate_case(group_size, message_size, mention_all, with_file, seed))
+    return cases
+
+def update_corpus():
+    parser = SkypeMessageParser(BOT_ID, COMMANDS)
+    corpus = [dict(case, expected=parse(parser, case)) for case in get_corpus_cases()]
+    with open(CORPUS_PATH, 'w', encoding='utf-8') as f:
+        json.dump(corpus, f, ensure_ascii=False, indent=1)
+    print('{0} cases written to {1}'.format(len(corpus), CORPUS_PATH))
+
+def check_corpus() -> bool:
+    parser = SkypeMessageParser(BOT_ID, COMMANDS)
+    with open(CORPUS_PATH, encoding='utf-8') as f:
+        corpus = json.load(f)
+    failed = 0
+    for i, case in enumerate(corpus):
+        actual = parse(parser, case)
+        if actual != case['expected']:
+            failed += 1
+            print('case {0} failed: {1!r}\n  expected {2}\n  actual   {3}'.format(i, case['text'][:80],
+                                                                              case['expected'], actual))
+    print('{0} of {1} cases passed'.format(len(corpus) - failed, len(corpus)))
+    return failed == 0
+
+def measure(fn, min_time:float) -> tuple[float, int]:
+    """
+    this function calls function repeatedly for at least min_time seconds
+    :return: calls per second and number of calls
+    """
+    calls = 0
+    start = time.perf_counter()
+    elapsed = 0.0
+    while elapsed < min_time or calls < 3:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+    return calls / elapsed, calls
+
+def measure_allocations(fn) -> tuple[int, int]:
+    """
+    this function measures memory allocated by one call
+    :return: peak allocated bytes and number of allocated blocks left after call
+    """
+    fn()  # warm up caches, e.g. members trie
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, 'filename'))
+    return peak, blocks
+
+def run_benchmark(quick:bool):
+    group_sizes = (3, 100) if quick else (3, 10, 100, 1000)
+    message_sizes = (10, 1024) if quick else (10, 256, 4096, 65536)
+    min_time = 0.05 if quick else 0.5
+    parser = SkypeMessageParser(BOT_ID, COMMANDS)
+    print('{0:>6} {1:>6} {2:>5} {3:>5} {4:>35} {5:>12} {6:>10} {7:>11} {8:>7}'.format(
+        'group', 'bytes', 'all', 'file', 'function', 'calls/s', 'MB/s', 'peak bytes', 'blocks'))
+    for group_size in group_sizes:
+        for message_size in message_sizes:
+            for mention_all, with_file in ((False, False), (True, False), (False, True)):
+                case = generate_case(group_size, message_size, mention_all, with_file, group_size + message_size)
+                chat = FakeSkypeChat(tuple(case['members']))
+                msg = FakeSkypeTextMsg(case['text'], case['sender'])
+                functions = {
+                    'parse_chat_message': lambda: parser.parse_chat_message(msg, chat.userIds),
+                    'is_bot_mentioned_at_the_beginning': lambda: parser.is_bot_mentioned_at_the_beginning(msg.plain),
+                    'extract_mentioned_user_ids': lambda: parser.extract_mentioned_user_ids(msg.plain, chat.userIds,
+                                                                                            msg.userId, []),
+                }
+                for name, fn in functions.items():
+                    rate, calls = measure(fn, min_time)
+                    peak, blocks = measure_allocations(fn)
+                    print('{0:>6} {1:>6} {2:>5} {3:>5} {4:>35} {5:>12.0f} {6:>10.1f} {7:>11} {8:>7}'.format(
+                        group_size, len(msg.plain.encode('utf-8')), str(mention_all), str(with_file), name, rate,
+                        rate * len(msg.plain.encode('utf-8')) / 1e6, peak, blocks))
+
+if __name__ == '__main__':
+    args_parser = argparse.ArgumentParser(description='SkypeMessageParser benchmark and golden corpus')
+    args_parser.add_argument('mode', choices=['bench', 'check', 'update'])
+    args_parser.add_argument('--quick', action='store_true', help='run small benchmark')
+    args = args_parser.parse_args()
+    if args.mode == 'bench':
+        run_benchmark(args.quick)
+    elif args.mode == 'update':
+        update_corpus()
+    elif not check_corpus():
+        sys.exit(1)
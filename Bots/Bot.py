@@ -1,15 +1,25 @@
+import atexit
 import json
 import logging
+import config
+from concurrent.futures import ThreadPoolExecutor
 from deep_translator import GoogleTranslator
 from telebot.types import Message
 from typing import Union
 from skpy import SkypeTextMsg
 from enum import Enum
+from Helpers.LogPipeline import configure_logging
+from Helpers.LRUCache import LRUCache
+from Helpers.Metrics import registry
+from Helpers.MetricsServer import start_metrics_server
+from Helpers.TranslationCache import TranslationCache
 
 class BotChat:
     """
     This class represents chat in which bot is present
     """
+    __slots__ = ('chat_id', 'language', 'name')
+
     def __init__(self, chat_id: Union[str, int], language: str, chat_name: str):
         """
         @:param chat_id: chat id
@@ -34,25 +44,51 @@ class Bot:
     def __init__(self, name: str, bot_type:BotType, db_manager, iomanager=None):
         self.name = name
         self.bot_type = bot_type
+        self.logger = self.create_logger()
         self.db_manager = db_manager
         self.iomanager = iomanager
-        self.chats_settings = []
+        # settings of recently used chats, other chats are loaded from DB on demand
+        self.chats_settings = LRUCache(getattr(config, 'chats_cache_size', 10000))  # str(chat id) -> BotChat
+        # ids of chats which are known to be in DB, so they are never inserted again
+        self.known_chats = set()
         self.commands = {}
-        self.translator = GoogleTranslator(source='english')
+        self.translation_executor = ThreadPoolExecutor(max_workers=getattr(config, 'translation_workers', 4),
+                                                       thread_name_prefix='translator')
+        self.translation_cache = TranslationCache(getattr(config, 'translation_cache_size', 4096),
+                                                  getattr(config, 'translation_cache_path', None))
+        atexit.register(self.translation_cache.save)
+        self.register_metrics()
         self.load_chats()
-        self.logger = self.create_logger()
+
+    def register_metrics(self):
+        """
+        function that registers bot metrics and starts metrics endpoint if its port is set in config
+        (skype_metrics_port or tg_metrics_port)
+        """
+        labels = {'bot': self.get_bot_prefix()}
+        self.translation_time = registry.histogram('translation_request_seconds',
+                                                   'Time spent in translator service requests', labels)
+        cache = self.translation_cache
+        registry.counter('translation_cache_hits_total', 'Number of translations found in cache', labels)\
+            .set_function(lambda: cache.hits)
+        registry.counter('translation_cache_misses_total', 'Number of translations not found in cache', labels)\
+            .set_function(lambda: cache.misses)
+        registry.gauge('translation_cache_hit_ratio', 'Share of translations found in cache', labels)\
+            .set_function(lambda: cache.hits / (cache.hits + cache.misses) if cache.hits + cache.misses else 0.0)
+        registry.gauge('translation_cache_entries', 'Number of translations in cache', labels)\
+            .set_function(lambda: len(cache))
+        registry.gauge('chats_cache_entries', 'Number of chats settings in cache', labels)\
+            .set_function(lambda: len(self.chats_settings))
+        port = getattr(config, self.get_bot_prefix() + '_metrics_port', None)
+        if port is not None:
+            start_metrics_server(port, getattr(config, 'metrics_host', '127.0.0.1'))
 
     def create_logger(self) -> logging.Logger:
         """
-        function that creates file logger for bot instanse
+        function that creates file logger for bot instanse. Logging is set up once per process,
+        so bots which run in one process share log file
         """
-        logger = logging.getLogger()
-        logger.setLevel(logging.DEBUG)
-        log_name = '../skype_bot.log' if self.bot_type == BotType.SKYPE_BOT else '../tg_bot.log'
-        handler = logging.FileHandler(log_name, 'w', 'utf-8')
-        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
-        logger.addHandler(handler)
-        return logger
+        return configure_logging('../skype_bot.log' if self.bot_type == BotType.SKYPE_BOT else '../tg_bot.log')
 
     def load_bot_commands(self, path_to_file: str):
         """
@@ -71,9 +107,48 @@ class Bot:
         @:param target_language: language to translate to
         @:return: translated text
         """
-        self.translator.source = source_language
-        self.translator.target = target_language
-        return self.translator.translate(text)
+        translation = self.translation_cache.get_translation(text, source_language, target_language)
+        if translation is None:
+            translation = self.request_translation(text, source_language, target_language)
+        return translation
+
+    def translate_many(self, texts: list[str], source_language: str, target_language: str) -> list[str]:
+        """
+        function that translates several messages from one language to other at once.
+        Messages which are not in translation cache are translated concurrently
+        @:param texts: messages texts
+        @:param source_language: language to translate from
+        @:param target_language: language to translate to
+        @:return: translated texts in the same order as given texts
+        """
+        translations = {}
+        for text in texts:
+            if text not in translations:
+                translations[text] = self.translation_cache.get_translation(text, source_language, target_language)
+        missed = [text for text, translation in translations.items() if translation is None]
+        if len(missed) == 1:
+            translations[missed[0]] = self.request_translation(missed[0], source_language, target_language)
+        elif missed:
+            futures = [self.translation_executor.submit(self.request_translation, text, source_language, target_language)
+                       for text in missed]
+            for text, future in zip(missed, futures):
+                translations[text] = future.result()
+        return [translations[text] for text in texts]
+
+    def request_translation(self, text: str, source_language: str, target_language: str) -> str:
+        """
+        function that translates message with translator service and saves result in translation cache
+        @:param text: message text
+        @:param source_language: language to translate from
+        @:param target_language: language to translate to
+        @:return: translated text
+        """
+        # translator keeps languages as its state, so every request uses its own instance to be thread safe
+        translator = GoogleTranslator(source=source_language, target=target_language)
+        with self.translation_time.span():
+            translation = translator.translate(text)
+        self.translation_cache.add_translation(text, source_language, target_language, translation)
+        return translation
 
     def send_translated_message(self, chat_id: Union[str, int], text: str,
                                 source_language: str, target_language: str, reply_markup=None):
@@ -94,12 +169,12 @@ class Bot:
         @:param full: True if function should return full language name, False if shortened ('english ; 'en')
         @:return str: chat language
         """
-        cur_chat_settings = [setting for setting in self.chats_settings if str(setting.chat_id) == str(chat_id)]
-        assert cur_chat_settings
+        cur_chat_settings = self.get_chat_settings(chat_id)
+        assert cur_chat_settings is not None
         if not full:
-            return cur_chat_settings[0].language
+            return cur_chat_settings.language
         else:
-            return 'ukrainian' if cur_chat_settings[0].language == 'uk' else 'english'
+            return 'ukrainian' if cur_chat_settings.language == 'uk' else 'english'
 
     def update_chat_language(self, chat_id: Union[str, int], new_language: str) -> bool:
         """
@@ -114,43 +189,78 @@ class Bot:
                                          source_language='en', target_language=language)
             return False
         else:
-            chats_table = self.get_chats_table_name()
-            update_query = "update " + chats_table + " set language = '{0}' where chat_link = '{1}'"\
-                .format(new_language, chat_id)
-            self.db_manager.execute_query(update_query)
+            self.db_manager.execute_statement(self.get_chats_statement_name('update_{0}_chat_language'),
+                                              (new_language, str(chat_id)))
             # update local storage
-            for i in range(len(self.chats_settings)):
-                if str(self.chats_settings[i].chat_id) == str(chat_id):
-                    self.chats_settings[i].language = new_language
+            self.get_chat_settings(chat_id).language = new_language
             update_info = 'Interface language was changed on ' + self.get_chat_language(chat_id, full=True)
             self.send_translated_message(chat_id, update_info, source_language='en',
                                          target_language=new_language)
             return True
 
-    def get_chats_table_name(self) -> str:
+    def get_bot_prefix(self) -> str:
         """
-        function that returns table name of bot's chats in DB
-        :return:
+        function that returns short name of bot type used in config keys and metrics labels
+        :return: 'skype' or 'tg'
         """
         if self.bot_type == BotType.SKYPE_BOT:
-            return 'bot_skype_chats'
+            return 'skype'
         elif self.bot_type == BotType.TELEGRAM_BOT:
-            return 'bot_tg_chats'
+            return 'tg'
         else:
-            self.logger.error(self.get_chat_language.__name__ + ' wrong bot type')
-            raise RuntimeError(self.get_chat_language.__name__)
+            self.logger.error(self.get_bot_prefix.__name__ + ' wrong bot type')
+            raise RuntimeError(self.get_bot_prefix.__name__)
+
+    def get_chats_statement_name(self, statement: str) -> str:
+        """
+        function that returns name of DB statement for bot's chats table
+        :param statement: statement name where {0} is replaced with bot type ('select_{0}_chat')
+        :return: statement name
+        """
+        return statement.format(self.get_bot_prefix())
 
     def load_chats(self):
         """
-        function that loads bot's chats from remote Database into local storage
+        function that warms up local storage with bot's chats from remote Database.
+        Only chats_warmup_size chats are loaded, rows are read page by page with server side cursor
         """
         assert (self.db_manager is not None)
-        chats_table = self.get_chats_table_name()
-        query = "select * from " + chats_table
-        res = self.db_manager.execute_query(query, fetch=True)
-        for chat in res:
-            self.chats_settings.append(BotChat(chat[1], chat[2], chat[3])) if self.bot_type == BotType.SKYPE_BOT else \
-                self.chats_settings.append(BotChat(chat[1], chat[2], ''))
+        warmup_size = min(getattr(config, 'chats_warmup_size', 0), self.chats_settings.max_size)
+        if warmup_size <= 0:
+            return
+        rows = self.db_manager.iterate_statement(self.get_chats_statement_name('select_{0}_chats'),
+                                                 page_size=getattr(config, 'chats_warmup_page_size', 1000))
+        for i, chat in enumerate(rows):
+            if i >= warmup_size:
+                rows.close()
+                break
+            self.cache_chat(chat)
+
+    def get_chat_settings(self, chat_id: Union[str, int]) -> BotChat:
+        """
+        function that returns chat settings from local storage or loads them from remote Database
+        @:param chat_id: chat id
+        @:return: chat settings or None if there is no such chat
+        """
+        chat = self.chats_settings.get(str(chat_id))
+        if chat is None:
+            res = self.db_manager.execute_statement(self.get_chats_statement_name('select_{0}_chat'), (str(chat_id),),
+                                                    fetch=True)
+            if res:
+                chat = self.cache_chat(res[0])
+        return chat
+
+    def cache_chat(self, row: tuple) -> BotChat:
+        """
+        function that puts chat loaded from remote Database into local storage
+        @:param row: bot chats table row
+        @:return: chat settings
+        """
+        chat_name = row[3] if self.bot_type == BotType.SKYPE_BOT else ''
+        chat = BotChat(row[1], row[2], chat_name)
+        self.chats_settings.put(str(row[1]), chat)
+        self.known_chats.add(str(row[1]))
+        return chat
 
     def add_new_chat(self, chat_id: Union[str, int], *args) -> bool:
         """
@@ -160,20 +270,16 @@ class Bot:
         @:param args: additional table arguments
         @:return: True if new chat was added to DB, False otherwise
         """
-        table = self.get_chats_table_name()
-        query = "select * from {0} where chat_link = '{1}'".format(table, chat_id)
-        if not self.db_manager.execute_query(query, fetch=True):
+        if str(chat_id) not in self.known_chats and self.get_chat_settings(chat_id) is None:
             if self.bot_type == BotType.SKYPE_BOT:
                 assert (len(args) == 1)
                 chat_name = args[0]
-                insert_query = "insert into {0} (chat_link, chat_name, language) " \
-                               "values('{1}', '{2}', '{3}')".format(table, chat_id, chat_name, 'en')
-                self.chats_settings.append(BotChat(chat_id, 'en', chat_name))
+                self.db_manager.execute_statement('insert_skype_chat', (str(chat_id), chat_name))
+                self.chats_settings.put(str(chat_id), BotChat(chat_id, 'en', chat_name))
             else:
-                insert_query = "insert into {0} (chat_link, language) values('{1}', '{2}')"\
-                    .format(table, chat_id, 'en')
-                self.chats_settings.append(BotChat(chat_id, 'en', ''))
-            self.db_manager.execute_query(insert_query)
+                self.db_manager.execute_statement('insert_tg_chat', (str(chat_id),))
+                self.chats_settings.put(str(chat_id), BotChat(chat_id, 'en', ''))
+            self.known_chats.add(str(chat_id))
             self.logger.info('New chat ' + str(chat_id))
             return True
         return False
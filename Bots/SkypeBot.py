@@ -3,12 +3,14 @@
 
 import config
 import time
-import threading
-from threading import Thread
 from skpy import *
 from Helpers import SkypeMessageParser as msgParser
+from Helpers.AttachmentRegistry import AttachmentRegistry, TimerWheel
 from Helpers.DatabaseManager import DatabaseManager
-from Helpers.IOManager import IOManager
+from Helpers.IOManager import IOManager, AttachmentSizeError
+from Helpers.MembershipCache import MembershipCache
+from Helpers.Metrics import registry
+from Helpers.WorkerPool import KeyedWorkerPool, OverflowPolicy
 from Bots.Bot import *
 
 class SkypeBot(SkypeEventLoop, Bot):
@@ -16,15 +18,30 @@ class SkypeBot(SkypeEventLoop, Bot):
     This class represents Skype bot instance
     """
     def __init__(self):
-        self.lock = threading.Lock()
-        self.attachment_requests = []
+        # events of one chat are handled one by one in order, events of different chats in parallel
+        self.event_pool = KeyedWorkerPool(getattr(config, 'skype_event_workers', 8), 'skype-events',
+                                          getattr(config, 'skype_event_queue_size', 100),
+                                          OverflowPolicy(getattr(config, 'skype_event_overflow_policy', 'block')))
+        # messages waiting for files from their senders. Expired messages are sent in order with chat events,
+        # they are added to full queue too, so timer thread never waits and messages are never dropped
+        self.attachment_registry = AttachmentRegistry(TimerWheel(),
+                                                      lambda *args: self.submit_chat_task(*args, force=True))
+        self.attachment_timeout = getattr(config, 'attachment_timeout', 45)
+        # Telegram doesn't allow bots to upload files bigger than 50 MB
+        self.attachment_max_size = getattr(config, 'attachment_max_size', 50 * 1024 * 1024)
+        self.event_latency = registry.histogram('skype_event_latency_seconds',
+                                                'Time from Skype event receiving till it is handled')
+        self.parse_time = registry.histogram('skype_message_parse_seconds', 'Time spent parsing Skype messages')
         super(SkypeBot, self).__init__(config.skype_bot_login, config.skype_bot_password)
         Bot.__init__(self, self.user.name, BotType.SKYPE_BOT, DatabaseManager(), IOManager())
         self.load_bot_commands('../skype_bot_commands.txt')
         self.commands['!about'] = self.commands['!about'].replace("{0}", str(self.name))
         self.messageParser = msgParser.SkypeMessageParser(self.userId, self.commands.keys())
+        # chat members are loaded from Skype only when cache entry expired or members changed
+        self.members = MembershipCache(lambda chat_id: tuple(self.chats.chat(chat_id).userIds),
+                                       getattr(config, 'membership_cache_ttl', 300),
+                                       getattr(config, 'membership_cache_size', 10000))
         self.logger.info('Skype bot instance created')
-        print('Skype bot instance created')
 
     def attach_file_to_message(self, msg:SkypeMsg) -> bool:
         """
@@ -33,34 +50,89 @@ class SkypeBot(SkypeEventLoop, Bot):
         @:param msg: Skype text message object
         @:return: True if file has been "attached", False otherwise
         """
-        with self.lock:
-            for i in range(len(self.attachment_requests)):
-                if self.attachment_requests[i].sender_id == msg.userId:
-                    self.attachment_requests[i].attachment = msg.fileContent  # file bytes
-                    self.attachment_requests[i].attachment_name = msg.file.name
-                    self.attachment_requests.remove(self.attachment_requests[i])
-                    return True
+        request = self.attachment_registry.take(msg.chatId, msg.userId)
+        if request is None:
             return False
+        try:
+            request.data.attachment_file = self.download_attachment(msg)
+            request.data.attachment_name = msg.file.name
+        except AttachmentSizeError as e:
+            self.logger.error(str(e))
+            text = 'File is too big. Max size is {0} MB'.format(self.attachment_max_size // (1024 * 1024))
+            self.send_translated_message(msg.chatId, text, 'en', self.get_chat_language(msg.chatId))
+        except Exception as e:
+            self.logger.error('File couldn\'t be attached: ' + str(e))
+        finally:
+            # message is sent even if file couldn't be attached
+            request.on_complete(request.data)
+        return request.data.attachment_name != ''
+
+    def download_attachment(self, msg:SkypeFileMsg) -> str:
+        """
+        function that downloads file sent by user into messages spool chunk by chunk
+        @:param msg: Skype file message object
+        @:return: attachment file name in spool
+        """
+        if msg.file.size and int(msg.file.size) > self.attachment_max_size:
+            raise AttachmentSizeError('Attachment size {0} is bigger than allowed'.format(msg.file.size))
+        try:
+            response = self.conn("GET", msg.urlContent, auth=SkypeConnection.Auth.Authorize, stream=True)
+        except SkypeApiException:
+            # try retrieving via the patched ASM URL instead
+            response = self.conn("GET", msg.urlContentAsm, auth=SkypeConnection.Auth.Authorize, stream=True)
+        with response:
+            return self.iomanager.write_attachment(response.iter_content(self.iomanager.chunk_size),
+                                                   self.attachment_max_size)
 
     def onEvent(self, event):
         """
         function which reacts on events in chat
         @:param event: some event
         """
-        if isinstance(event, SkypeNewMessageEvent) and not event.msg.userId == self.userId:
+        if isinstance(event, SkypeChatMemberEvent):
+            self.members.invalidate(event.chatId)
+        elif isinstance(event, SkypeNewMessageEvent) and isinstance(event.msg, SkypeMemberMsg):
+            self.members.invalidate(event.msg.chatId)
+        elif isinstance(event, SkypeNewMessageEvent) and not event.msg.userId == self.userId:
             if isinstance(event.msg, SkypeFileMsg):
-                Thread(target=self.attach_file_to_message, args=(event.msg,)).start()
+                handler = self.attach_file_to_message
             elif isinstance(event.msg, SkypeTextMsg):
                 # print('raw ', event.msg.raw)
                 # print('plain text ' + event.msg.plain)
-                Thread(target=self.react_on_message, args=(event.msg,)).start()
+                handler = self.react_on_message
+            else:
+                return
+            self.submit_chat_task(event.msg.chatId, handler, event.msg)
+
+    def submit_chat_task(self, chat_id, fn, *args, force:bool=False):
+        """
+        function which runs task in event pool after tasks of this chat submitted earlier
+        @:param chat_id: Skype chat id
+        @:param fn: function to run
+        @:param force: True if task is added even if queue is full
+        """
+        received = time.monotonic()
+        submit = self.event_pool.force_submit if force else self.event_pool.submit
+        future = submit(chat_id, fn, *args)
+        future.add_done_callback(lambda f: self.on_event_handled(f, received))
+
+    def on_event_handled(self, future, received:float):
+        """
+        function which logs result of event handling
+        @:param future: future of event handler
+        @:param received: time when event was received
+        """
+        self.event_latency.observe(time.monotonic() - received)
+        error = future.exception()
+        if error is not None:
+            self.logger.error('Skype event handling failed: ' + str(error))
 
     # below functions defines base class Bot methods
     def react_on_message(self, msg:SkypeTextMsg):
         # new chat. new chat has always en language as default
         if self.add_new_chat(msg.chatId, msg.raw['threadtopic']):
-            self.chats.chat(msg.chatId).sendMsg(self.commands['!about'], rich=True)
-            self.chats.chat(msg.chatId).sendMsg(self.commands['!commands'], rich=True)
+            self.chats[msg.chatId].sendMsg(self.commands['!about'], rich=True)
+            self.chats[msg.chatId].sendMsg(self.commands['!commands'], rich=True)
         if not self.is_message_from_group(msg.chatId):
             # if message is from private chat then we need only parse command tokens
             command = self.messageParser.get_command_token(msg.plain)
@@ -69,7 +141,9 @@ class SkypeBot(SkypeEventLoop, Bot):
             else:
                 self.answer_on_command('!commands', msg.chatId)
         else:
-            parser_res = self.messageParser.parse_chat_message(msg, self.chats.chat(msg.chatId))
+            chat_user_ids = self.members.get_members(msg.chatId)
+            with self.parse_time.span():
+                parser_res = self.messageParser.parse_chat_message(msg, chat_user_ids)
             if parser_res.should_react:
                 if not parser_res.error_msg == '':
                     self.send_translated_message(msg.chatId, parser_res.error_msg, 'en', self.get_chat_language(msg.chatId))
@@ -79,22 +153,32 @@ class SkypeBot(SkypeEventLoop, Bot):
                     self.answer_on_command(parser_res.command_token, msg.chatId)
                     return
                 else:
-                    # only text
+                    display_name = msg.raw['imdisplayname']
+                    on_complete = lambda data: self.send_parsed_message(msg.chatId, display_name, data)
                     if not parser_res.has_attachment:
-                        self.iomanager.write_message_to_file(parser_res)
+                        on_complete(parser_res)
                     else:
-                        self.attachment_requests.append(parser_res)
-                        timeout = 45
-                        inform_msg = 'You have ' + str(timeout) + ' seconds to attach your file'
+                        # message is sent when user attaches file or waiting time is over,
+                        # no thread is waiting for file meanwhile
+                        self.attachment_registry.add(msg.chatId, msg.userId, parser_res,
+                                                     self.attachment_timeout, on_complete)
+                        inform_msg = 'You have ' + str(self.attachment_timeout) + ' seconds to attach your file'
                         self.send_translated_message(msg.chatId, inform_msg, 'en', self.get_chat_language(msg.chatId))
-                        if not wait_for_attachment(timeout, parser_res):  # if user didn't sent file, remove this request
-                            self.attachment_requests.remove(parser_res)
-                        self.iomanager.write_message_to_file(parser_res)
-                    self.send_translated_message(msg.chatId, '{0},'.format(msg.raw['imdisplayname']) +
-                                                 ' your message has been sent!', 'en', self.get_chat_language(msg.chatId))
+
+    def send_parsed_message(self, chat_id:str, display_name:str, data):
+        """
+        function that writes parsed message to messages spool and informs sender about it
+        @:param chat_id: Skype chat id
+        @:param display_name: message sender display name
+        @:param data: parsed message
+        """
+        self.iomanager.write_message_to_file(data)
+        self.send_translated_message(chat_id, '{0},'.format(display_name) + ' your message has been sent!',
+                                     'en', self.get_chat_language(chat_id))
 
     def send_message(self, chat_id: Union[str, int], text: str, reply_markup=None):
-        self.chats.chat(chat_id).sendMsg(text, rich=True)
+        # chat object is taken from skpy cache instead of being requested from Skype for every message
+        self.chats[chat_id].sendMsg(text, rich=True)
 
     def answer_on_command(self, command:str, chat_id):
         if command == '!language(uk)':
@@ -103,25 +187,14 @@ class SkypeBot(SkypeEventLoop, Bot):
             self.update_chat_language(chat_id, 'en')
         elif command == '!commands':
             # don't translate commands
-            self.chats.chat(chat_id).sendMsg(self.commands[command])
+            self.chats[chat_id].sendMsg(self.commands[command])
         elif command == '!link':
-            print(self.get_chat_language(chat_id))
             self.send_translated_message(chat_id, 'This chat link: ' + str(chat_id), 'en', self.get_chat_language(chat_id))
         else:
             self.send_translated_message(chat_id, self.commands[command], 'en', self.get_chat_language(chat_id))
 
     def is_message_from_group(self, chat_id:str) -> bool:
-        print('users in chat = ', len(self.chats[chat_id].userIds))
-        return len(self.chats[chat_id].userIds) > 2
-
-def wait_for_attachment(timeout, res, period=0.5) -> bool:
-    start = time.time()
-    mustend = start + timeout
-    while time.time() < mustend:
-        if res.attachment_name != '':
-            return True
-        time.sleep(period)
-    return False
+        return len(self.members.get_members(chat_id)) > 2
 
 
 if __name__ == '__main__':
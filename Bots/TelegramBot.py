@@ -3,11 +3,18 @@
 
 import telebot
 import config
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery
+import requests
+from requests.adapters import HTTPAdapter
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, CallbackQuery, ChatMemberUpdated
 from Bots.Bot import *
 from Helpers import MessageSendingManager
+from Helpers.MembershipCache import MembershipCache
+from Helpers.WebhookServer import WebhookServer
+from Helpers.OutboundScheduler import OutboundScheduler, MessagePriority
+from Helpers.RateLimiter import RateLimiter
 from Helpers.SubscriptionsManager import UserSubscriptionRequest, UserSubscription, SubscriptionsManager
 from threading import Thread
+import threading
 
 
 class MarkupContext(Enum):
@@ -19,21 +26,159 @@ class MarkupContext(Enum):
     LANGUAGE_MENU = 3
     NONE = 4
 
+class MarkupTemplates:
+    """
+    This class represents storage of reply markup keyboards and texts translated once per language
+    """
+    # keyboards layouts. Every button is (text, callback data)
+    layouts = {
+        MarkupContext.MAIN_MENU: [
+            [('Create new subscription', 'new_sub_request')],
+            [('Subscriptions management', 'sub_management')],
+            [('Set language', 'set_language')],
+        ],
+        MarkupContext.LANGUAGE_MENU: [
+            [('English', 'en_language')],
+            [('Українська', 'uk_language')],
+            [('Back to main menu', 'back_main_menu')],
+        ],
+        MarkupContext.SUB_MANAGEMENT_MENU: [
+            [('Active subscriptions', 'active_sub')],
+            [('Blacklist subscriptions', 'blacklist_sub')],
+            [('Back to main menu', 'back_main_menu')],
+        ],
+    }
+    # texts of buttons which are created for every user's subscriptions
+    labels = ['To blacklist', 'Delete', 'Make active', 'Back', 'Nothing in blacklist',
+              'You don\'t have any subscription yet']
+    # texts of messages with menus
+    titles = ['Choose language', 'Choose management option', 'Your subscriptions', 'Your blacklist']
+    # buttons which shouldn't be translated
+    untranslated_callbacks = ['en_language', 'uk_language']
+
+    def __init__(self, bot):
+        """
+        :param bot: bot which translates templates
+        """
+        self.bot_ref = bot
+        self.lock = threading.Lock()
+        self.keyboards = {}
+        self.texts = {}
+
+    def get_keyboard(self, cxt:MarkupContext, lang:str) -> list[list[InlineKeyboardButton]]:
+        """
+        this function creates keyboard from translated template
+        :param cxt: markup context
+        :param lang: keyboard language
+        :return: new keyboard which can be changed by caller
+        """
+        key = (cxt, lang)
+        template = self.keyboards.get(key)
+        if template is None:
+            template = [
+                [(text if callback in self.untranslated_callbacks else self.get_text(text, lang), callback)
+                 for text, callback in row]
+                for row in self.layouts[cxt]
+            ]
+            with self.lock:
+                self.keyboards[key] = template
+        return [[InlineKeyboardButton(text, callback_data=callback) for text, callback in row] for row in template]
+
+    def get_text(self, text:str, lang:str) -> str:
+        """
+        this function returns text translated from english
+        :param text: text in english
+        :param lang: language to translate to
+        :return: translated text
+        """
+        key = (text, lang)
+        translation = self.texts.get(key)
+        if translation is None:
+            translation = text if lang == 'en' else self.bot_ref.translate_text(text, 'en', lang)
+            with self.lock:
+                self.texts[key] = translation
+        return translation
+
+    def get_labels(self, lang:str) -> dict:
+        """
+        this function returns translated subscriptions keyboard labels
+        :param lang: labels language
+        :return: dict where key is label in english and value is translated label
+        """
+        self.translate_texts(self.labels, lang)
+        return {label: self.get_text(label, lang) for label in self.labels}
+
+    def translate_texts(self, texts:list[str], lang:str):
+        """
+        this function translates texts which are not in templates yet at once
+        :param texts: texts in english
+        :param lang: language to translate to
+        """
+        missed = [text for text in texts if (text, lang) not in self.texts]
+        if not missed:
+            return
+        translations = missed if lang == 'en' else self.bot_ref.translate_many(missed, 'en', lang)
+        with self.lock:
+            self.texts.update({(text, lang): translation for text, translation in zip(missed, translations)})
+
+    def warm_up(self, languages:list[str]):
+        """
+        this function translates all templates in advance
+        :param languages: languages to translate templates to
+        """
+        for lang in languages:
+            texts = [text for cxt in self.layouts for row in self.layouts[cxt] for text, callback in row
+                     if callback not in self.untranslated_callbacks]
+            self.translate_texts(texts + self.labels + self.titles + list(self.bot_ref.commands.values()), lang)
+            for cxt in self.layouts:
+                self.get_keyboard(cxt, lang)
+
+    def invalidate(self):
+        """
+        this function removes all translated templates
+        """
+        with self.lock:
+            self.keyboards.clear()
+            self.texts.clear()
+
 class TelegramBot(Bot):
     """
     This class represents Telegram bot instance
     """
     def __init__(self):
+        # one keep-alive session with connections pool is shared by all threads which call Telegram API
+        self.http_session = requests.Session()
+        pool_size = getattr(config, 'telegram_senders', 8) + 4  # scheduler senders, polling and handlers threads
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.http_session.mount('https://', adapter)
+        self.http_session.mount('http://', adapter)
+        telebot.apihelper.session = self.http_session
+        # Bot API server can be changed, e.g. to local Bot API server or to mock server in load tests
+        api_url = getattr(config, 'telegram_api_url', None)
+        if api_url:
+            telebot.apihelper.API_URL = api_url
         self.bot = telebot.TeleBot(config.tg_bot_token)
+        self.markup_templates = MarkupTemplates(self)
+        # members count is requested from Telegram only when cache entry expired or members changed
+        self.members = MembershipCache(self.bot.get_chat_members_count, getattr(config, 'membership_cache_ttl', 300),
+                                       getattr(config, 'membership_cache_size', 10000))
+        # all messages to users are sent through scheduler, so menus are sent before bulk messages and limits are kept
+        self.scheduler = OutboundScheduler(RateLimiter(getattr(config, 'telegram_global_rate', 30),
+                                                       getattr(config, 'telegram_chat_rate', 1),
+                                                       getattr(config, 'telegram_chat_burst', 3)),
+                                           getattr(config, 'telegram_senders', 8))
         Bot.__init__(self, self.bot.get_me().first_name, BotType.TELEGRAM_BOT, SubscriptionsManager())
-        self.iomanager = MessageSendingManager.MessageSendingManager(self)
+        # spool is sent by one process only: sender binds fixed notification port and tracks sent files in memory,
+        # so other webhook replicas of bot are started with spool_sender = False
+        if getattr(config, 'spool_sender', True):
+            self.iomanager = MessageSendingManager.MessageSendingManager(self)
         self.load_bot_commands('../tg_bot_commands.txt')
         self.bot.set_my_commands([
             telebot.types.BotCommand(key, 'Enter to find out :)') for key in self.commands.keys() if key != 'default'
         ])
         self.commands['start'] = self.commands['start'].replace("{0}", str(self.name))
+        Thread(target=self.markup_templates.warm_up, args=(['en', 'uk'],), daemon=True).start()
         self.logger.info('Telegram bot instance created')
-        print('Telegram bot instance created')
 
         # it's required to place decorators and all Telegram bot handlers in constuctor because of wrapping bot object
         @self.bot.message_handler(commands=self.commands.keys())
@@ -48,6 +193,22 @@ class TelegramBot(Bot):
             message.text = message.text.replace('/', '')
             self.answer_on_command(message.text, message.chat.id)
 
+        @self.bot.message_handler(content_types=['new_chat_members', 'left_chat_member'])
+        def members_reactor(message:Message):
+            """
+            this function invalidates cached members count when someone joins or leaves chat
+            :param message: service message about chat members
+            """
+            self.members.invalidate(message.chat.id)
+
+        @self.bot.my_chat_member_handler()
+        def bot_membership_reactor(update:ChatMemberUpdated):
+            """
+            this function invalidates cached members count when bot is added to chat or removed from it
+            :param update: bot membership update
+            """
+            self.members.invalidate(update.chat.id)
+
         @self.bot.callback_query_handler(func=lambda call:True)
         def callback_reactor(call:CallbackQuery):
             """
@@ -64,10 +225,10 @@ class TelegramBot(Bot):
                 thread = Thread(target=self.ask_for_skype_chat_id, args=(chat_id, req))
                 thread.start()
             elif call.data == 'back_main_menu':
-                text = self.translate_text(self.commands['default'], 'en', lang)
+                text = self.markup_templates.get_text(self.commands['default'], lang)
                 self.edit_message_text_and_markup(chat_id, message_id, text, MarkupContext.MAIN_MENU)
             elif call.data == 'set_language':
-                text = self.translate_text('Choose language', 'en', lang)
+                text = self.markup_templates.get_text('Choose language', lang)
                 self.edit_message_text_and_markup(chat_id, message_id, text, MarkupContext.LANGUAGE_MENU)
             elif call.data == 'en_language' or call.data == 'uk_language': 
                 new_lang = 'en' if 'en' in call.data else 'uk'
@@ -75,40 +236,38 @@ class TelegramBot(Bot):
                 self.update_chat_language(chat_id, new_lang)
                 # make message with menu first
                 self.bot.delete_message(chat_id, message_id)
-                self.send_translated_message(
-                    chat_id, self.commands['default'], 'en', new_lang, self.get_reply_markup(chat_id, MarkupContext.MAIN_MENU)
-                )
+                self.send_main_menu(chat_id, new_lang)
             elif call.data == 'sub_management':
-                text = self.translate_text('Choose management option', 'en', lang)
+                text = self.markup_templates.get_text('Choose management option', lang)
                 self.edit_message_text_and_markup(chat_id, message_id, text, MarkupContext.SUB_MANAGEMENT_MENU)
             elif call.data == 'active_sub':
                 subs = self.db_manager.get_user_subscriptions(chat_id, from_black_list=False)
                 markup = self.get_subs_reply_markup(chat_id, subs, False)
-                text = self.translate_text('Your subscriptions', 'en', lang)
+                text = self.markup_templates.get_text('Your subscriptions', lang)
                 self.edit_message_text_and_markup(chat_id, message_id, text, MarkupContext.NONE, markup)
             elif call.data == 'blacklist_sub':
                 subs = self.db_manager.get_user_subscriptions(chat_id, from_black_list=True)
                 markup = self.get_subs_reply_markup(chat_id, subs, True)
-                text = self.translate_text('Your blacklist', 'en', lang)
+                text = self.markup_templates.get_text('Your blacklist', lang)
                 self.edit_message_text_and_markup(chat_id, message_id, text, MarkupContext.NONE, markup)
             elif 'to_blacklist_' in call.data:
                 record_id = call.data[len('to_blacklist_'):]
-                print("to blacklist = ", record_id)
+                self.logger.debug('to blacklist = %s', record_id)
                 self.db_manager.change_subscription_state(record_id, True)
                 updated_keyboard = self.update_markup_keyboard(call.message.reply_markup.keyboard, record_id)
-                self.bot.edit_message_reply_markup(chat_id, message_id, reply_markup=InlineKeyboardMarkup(updated_keyboard))
+                self.edit_message_markup(chat_id, message_id, InlineKeyboardMarkup(updated_keyboard))
             elif 'from_blacklist_' in call.data:
                 record_id = call.data[len('from_blacklist_'):]
-                print("from blacklist = ", record_id)
+                self.logger.debug('from blacklist = %s', record_id)
                 self.db_manager.change_subscription_state(record_id, False)
                 updated_keyboard = self.update_markup_keyboard(call.message.reply_markup.keyboard, record_id)
-                self.bot.edit_message_reply_markup(chat_id, message_id, reply_markup=InlineKeyboardMarkup(updated_keyboard))
+                self.edit_message_markup(chat_id, message_id, InlineKeyboardMarkup(updated_keyboard))
             elif 'delete_' in call.data:
                 record_id = call.data[len('delete_'):]
-                print('delete sub ', record_id)
+                self.logger.debug('delete sub %s', record_id)
                 self.db_manager.delete_subscription(record_id)
                 updated_keyboard = self.update_markup_keyboard(call.message.reply_markup.keyboard, record_id)
-                self.bot.edit_message_reply_markup(chat_id, message_id, reply_markup=InlineKeyboardMarkup(updated_keyboard))
+                self.edit_message_markup(chat_id, message_id, InlineKeyboardMarkup(updated_keyboard))
 
     def update_markup_keyboard(self, keyboard:list[list[InlineKeyboardButton]], id_token:str) -> list[list[InlineKeyboardButton]]:
         """
@@ -132,17 +291,16 @@ class TelegramBot(Bot):
         :param blacklist: True if markup should contain blacklist subscriptions, False otherwise
         :return: created inline keyboard markup
         """
-        lang = self.get_chat_language(chat_id)
-        to_black = self.translate_text('To blacklist', 'en', lang)
-        delete = self.translate_text('Delete', 'en', lang)
-        make_active = self.translate_text('Make active', 'en', lang)
-        back = self.translate_text('Back', 'en', lang)
+        labels = self.markup_templates.get_labels(self.get_chat_language(chat_id))
+        to_black = labels['To blacklist']
+        delete = labels['Delete']
+        make_active = labels['Make active']
+        back = labels['Back']
         keyboard = []
         if not subs:
             keyboard.append([InlineKeyboardButton
-                             ('Nothing in blacklist' if blacklist else 'You don\'t have any subscription yet',
+                             (labels['Nothing in blacklist' if blacklist else 'You don\'t have any subscription yet'],
                               callback_data='nothing')])
-            self.translate_keyboard_buttons(chat_id, keyboard)
         else:
             for sub in subs:
                 if not blacklist:
@@ -169,10 +327,20 @@ class TelegramBot(Bot):
         :param markup_context: markup context
         :param markup: created earlier markup object. None by default
         """
-        self.bot.edit_message_text(new_text, chat_id, message_id)
+        self.scheduler.call(chat_id, MessagePriority.INTERACTIVE, self.bot.edit_message_text, new_text, chat_id, message_id)
         if markup is None:
             markup = self.get_reply_markup(chat_id, markup_context)
-        self.bot.edit_message_reply_markup(chat_id, message_id, reply_markup=markup)
+        self.edit_message_markup(chat_id, message_id, markup)
+
+    def edit_message_markup(self, chat_id, message_id, markup:InlineKeyboardMarkup):
+        """
+        this function edits reply markup of already sent bot's message
+        :param chat_id: chat id with user
+        :param message_id: bot's message id
+        :param markup: new markup
+        """
+        self.scheduler.call(chat_id, MessagePriority.INTERACTIVE, self.bot.edit_message_reply_markup,
+                            chat_id, message_id, reply_markup=markup)
 
     def ask_for_skype_chat_id(self, chat_id, req:UserSubscriptionRequest):
         """
@@ -183,7 +351,7 @@ class TelegramBot(Bot):
         text = self.translate_text(
             'Send me skype chat id where you want me to interact with you', 'en', self.get_chat_language(chat_id)
         )
-        msg = self.bot.send_message(chat_id, text)
+        msg = self.send_message(chat_id, text)
         self.bot.register_next_step_handler(msg, self.get_skype_chat_id, req)
 
     def get_skype_chat_id(self, message:Message, req:UserSubscriptionRequest):
@@ -194,38 +362,31 @@ class TelegramBot(Bot):
         :param req: structure for saving user's sent information
         """
         req.skype_group_id = message.text
+        req.user_tg_id = str(message.from_user.id)
         chat_id = message.chat.id 
         chat_lang = self.get_chat_language(chat_id)
-        is_already_present = "select c.user_id, chat_link from user_and_skype_chats c " \
-                             "inner join system_user s on c.user_id = s.user_id and s.tg_id = '{0}' where chat_link = '{1}'"\
-                             .format(message.from_user.id, message.text)
         # check if this user already created subscription on entered chat id
-        if self.db_manager.execute_query(is_already_present, fetch=True):
+        if self.db_manager.execute_statement('select_user_subscription', (str(message.from_user.id), message.text),
+                                             fetch=True):
             self.send_translated_message(
                 chat_id, 'You have already created subscription on ' + message.text + ' skype chat ', 'en', chat_lang
             )
-            self.send_translated_message(
-                chat_id, self.commands['default'], 'en', chat_lang, self.get_reply_markup(chat_id, MarkupContext.MAIN_MENU)
-            )
+            self.send_main_menu(chat_id, chat_lang)
             return
-        check_query = "select * from bot_skype_chats where chat_link = '{0}'".format(req.skype_group_id)
-        skype_chat_res = self.db_manager.execute_query(check_query, fetch=True)
+        skype_chat_res = self.db_manager.execute_statement('select_skype_chat', (req.skype_group_id,), fetch=True)
         # skype bot doesn't present in user's sent skype chat id
         if not skype_chat_res:
             self.send_translated_message(
                 chat_id, 'Bot is not present in skype chat with id ' + req.skype_group_id, 'en', chat_lang
             )
-            self.send_translated_message(
-                chat_id, self.commands['default'], 'en', chat_lang, self.get_reply_markup(chat_id, MarkupContext.MAIN_MENU)
-            )
+            self.send_main_menu(chat_id, chat_lang)
             return
         assert (len(skype_chat_res) != 0)
         req.skype_group_name = skype_chat_res[0][3]
-        skype_id_query = "select * from system_user where tg_id = '{0}'".format(message.from_user.id)
-        res = self.db_manager.execute_query(skype_id_query, fetch=True)
+        res = self.db_manager.execute_statement('select_user_by_tg_id', (str(message.from_user.id),), fetch=True)
         if not res:
             text = self.translate_text('Send me your skype id', 'en', chat_lang)
-            msg = self.bot.send_message(chat_id, text)
+            msg = self.send_message(chat_id, text)
             self.bot.register_next_step_handler(msg, self.get_user_skype_id, req)
         else:
             req.user_id = res[0][0]
@@ -238,22 +399,18 @@ class TelegramBot(Bot):
         :param message: user's message
         :param req: structure for saving user's sent information
         """
-        query = "select user_id from system_user where skype_id = '{0}'".format(message.text)
         lang = self.get_chat_language(message.chat.id)
-        res = self.db_manager.execute_query(query, fetch=True)
+        res = self.db_manager.execute_statement('select_user_id_by_skype_id', (message.text,), fetch=True)
         # check if user with such skype id already exists
         if res:
             self.send_translated_message(
                 message.chat.id, 'User with id ' + message.text + ' already exists', 'en', lang
             )
-            self.send_translated_message(
-                message.chat.id, self.commands['default'], 'en', lang, self.get_reply_markup(message.chat.id, MarkupContext.MAIN_MENU)
-            )
+            self.send_main_menu(message.chat.id, lang)
             return
         # new user
-        query = "insert into system_user(skype_id, tg_id) values('{0}', '{1}') returning user_id;"\
-                .format(message.text, message.from_user.id)
-        req.user_id = self.db_manager.execute_query(query,fetch=True)[0][0]
+        req.user_id = self.db_manager.execute_statement('insert_user', (message.text, str(message.from_user.id)),
+                                                        fetch=True)[0][0]
         req.user_skype_id = message.text
         self.create_subscription(message.chat.id, req)
 
@@ -266,8 +423,16 @@ class TelegramBot(Bot):
         self.db_manager.add_new_subscription(req)
         chat_lang = self.get_chat_language(chat_id)
         self.send_translated_message(chat_id, 'New subscription has been successfully created', 'en', chat_lang)
-        markup = self.get_reply_markup(chat_id, MarkupContext.MAIN_MENU)
-        self.send_translated_message(chat_id, self.commands['default'], 'en', chat_lang, markup)
+        self.send_main_menu(chat_id, chat_lang)
+
+    def send_main_menu(self, chat_id, lang:str):
+        """
+        this function sends message with main menu
+        :param chat_id: chat id with user
+        :param lang: chat language
+        """
+        text = self.markup_templates.get_text(self.commands['default'], lang)
+        self.send_message(chat_id, text, InlineKeyboardMarkup(self.markup_templates.get_keyboard(MarkupContext.MAIN_MENU, lang)))
 
     def get_reply_markup(self, chat_id, cxt:MarkupContext) -> InlineKeyboardMarkup:
         """
@@ -276,27 +441,7 @@ class TelegramBot(Bot):
         :param cxt: context for creating markup
         :return: inline keyboard markup
         """
-        keyboard = None
-        if cxt == MarkupContext.MAIN_MENU:
-            keyboard = [
-                [InlineKeyboardButton('Create new subscription', callback_data='new_sub_request')],
-                [InlineKeyboardButton('Subscriptions management', callback_data='sub_management')],
-                [InlineKeyboardButton('Set language', callback_data='set_language')],
-            ]
-        elif cxt == MarkupContext.LANGUAGE_MENU:
-            keyboard = [
-                [InlineKeyboardButton('English', callback_data='en_language')],
-                [InlineKeyboardButton('Українська', callback_data='uk_language')],
-            ]
-            self.add_back_button(keyboard, 'Back to main menu', 'back_main_menu')
-        elif cxt == MarkupContext.SUB_MANAGEMENT_MENU:
-            keyboard = [
-                [InlineKeyboardButton('Active subscriptions', callback_data='active_sub')],
-                [InlineKeyboardButton('Blacklist subscriptions', callback_data='blacklist_sub')],
-            ]
-            self.add_back_button(keyboard, 'Back to main menu', 'back_main_menu')
-        self.translate_keyboard_buttons(chat_id, keyboard)
-        return InlineKeyboardMarkup(keyboard)
+        return InlineKeyboardMarkup(self.markup_templates.get_keyboard(cxt, self.get_chat_language(chat_id)))
 
     def add_back_button(self, keyboard:list[list[InlineKeyboardButton]], button_text:str, callback_text:str):
         """
@@ -307,43 +452,44 @@ class TelegramBot(Bot):
         """
         keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_text)])
 
-    def translate_keyboard_buttons(self, chat_id, keyboard:list[list[InlineKeyboardButton]]):
-        """
-        this function translates keyboard buttons in reply keyboard markup
-        :param chat_id: chat id with user
-        :param keyboard: keyboard with buttons
-        """
-        lang = self.get_chat_language(chat_id)
-        if lang != 'en':
-            for lst_item in keyboard:
-                for button in lst_item:
-                    # do not translate language buttons
-                    if not button.callback_data == 'en_language' and not button.callback_data == 'uk_language':
-                        button.text = self.translate_text(button.text, 'en', lang)
+    def load_bot_commands(self, path_to_file: str):
+        super().load_bot_commands(path_to_file)
+        # translated command answers are stored in templates
+        self.markup_templates.invalidate()
 
     def start_polling(self):
         """
-        this function starts bot
+        this function starts bot. With telegram_update_mode = 'webhook' in config updates are received by
+        embedded webhook server, otherwise they are received with long polling
         """
-        self.bot.infinity_polling()
+        if getattr(config, 'telegram_update_mode', 'polling') == 'webhook':
+            server = WebhookServer(self.bot)
+            webhook_url = getattr(config, 'webhook_url', '')
+            if webhook_url:
+                server.register(webhook_url)
+            self.logger.info('Webhook server listens on port %s', server.port)
+            server.serve()
+        else:
+            self.bot.infinity_polling()
 
     # below functions defines base class Bot methods
     def react_on_message(self, msg: Union[SkypeTextMsg, Message]):
         """ this function just overrdies base method and does nothing """
         pass
 
-    def send_message(self, chat_id: Union[str, int], text: str, reply_markup=None):
-        self.bot.send_message(chat_id, text, reply_markup=reply_markup)
+    def send_message(self, chat_id: Union[str, int], text: str, reply_markup=None,
+                     priority:MessagePriority=MessagePriority.INTERACTIVE) -> Message:
+        return self.scheduler.call(chat_id, priority, self.bot.send_message, chat_id, text, reply_markup=reply_markup)
 
     def answer_on_command(self, command: str, chat_id: Union[str, int]):
-        text = self.commands[command]
+        text = self.markup_templates.get_text(self.commands[command], self.get_chat_language(chat_id))
         reply_markup = None
         if command == 'start':
             reply_markup = self.get_reply_markup(chat_id, MarkupContext.MAIN_MENU)
-        self.send_translated_message(chat_id, text, 'en', self.get_chat_language(chat_id), reply_markup)
+        self.send_message(chat_id, text, reply_markup)
 
     def is_message_from_group(self, chat_id: Union[str, int]) -> bool:
-        return self.bot.get_chat_members_count(chat_id) > 2
+        return self.members.get_members(chat_id) > 2
 
 
 if __name__ == '__main__':
@@ -0,0 +1,155 @@
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class TimerWheel:
+    """
+    This class represents hashed timer wheel: one thread which runs expired timers.
+    Timers are put into slots by their expiration tick, so adding and cancelling timer costs O(1)
+    """
+    def __init__(self, tick:float=0.5, slots_count:int=256):
+        """
+        :param tick: timer resolution in seconds
+        :param slots_count: number of wheel slots
+        """
+        self.tick = tick
+        self.slots = [[] for i in range(slots_count)]
+        self.current_tick = 0
+        self.lock = threading.Lock()
+        threading.Thread(target=self.run, name='timer-wheel', daemon=True).start()
+
+    def schedule(self, delay:float, callback) -> list:
+        """
+        this function adds timer
+        :param delay: time in seconds after which callback is called
+        :param callback: function without arguments
+        :return: timer handle which can be cancelled
+        """
+        ticks = max(1, int(round(delay / self.tick)))
+        with self.lock:
+            expiration_tick = self.current_tick + ticks
+            # timer is [expiration tick, callback, cancelled]
+            timer = [expiration_tick, callback, False]
+            self.slots[expiration_tick % len(self.slots)].append(timer)
+        return timer
+
+    def cancel(self, timer:list):
+        """
+        this function cancels timer. Cancelled timer is removed from wheel when its slot is processed
+        :param timer: timer handle
+        """
+        timer[2] = True
+
+    def run(self):
+        """
+        this function advances wheel every tick and runs expired timers
+        """
+        next_tick_time = time.monotonic() + self.tick
+        while True:
+            time.sleep(max(0.0, next_tick_time - time.monotonic()))
+            next_tick_time += self.tick
+            expired = []
+            with self.lock:
+                self.current_tick += 1
+                slot_index = self.current_tick % len(self.slots)
+                remaining = []
+                for timer in self.slots[slot_index]:
+                    if timer[2]:
+                        continue
+                    if timer[0] <= self.current_tick:
+                        expired.append(timer)
+                    else:
+                        remaining.append(timer)
+                self.slots[slot_index] = remaining
+            for timer in expired:
+                try:
+                    timer[1]()
+                except Exception as e:
+                    logger.error('timer callback failed: %s', e)
+
+class PendingAttachment:
+    """
+    This class represents message which waits for file from its sender
+    """
+    def __init__(self, chat_id, sender_id, data, on_complete):
+        """
+        :param chat_id: chat id
+        :param sender_id: message sender id
+        :param data: parsed message
+        :param on_complete: function called with parsed message when file is attached or waiting time is over
+        """
+        self.chat_id = chat_id
+        self.sender_id = sender_id
+        self.data = data
+        self.on_complete = on_complete
+        self.timer = None
+
+class AttachmentRegistry:
+    """
+    This class represents registry of messages waiting for files, keyed by (chat id, sender id)
+    """
+    def __init__(self, timer_wheel:TimerWheel, submit=None):
+        """
+        :param timer_wheel: timer wheel which expires waiting messages
+        :param submit: function which runs completion of expired message, called with chat id, completion function
+        and parsed message. If None, completion runs on timer wheel thread
+        """
+        self.timer_wheel = timer_wheel
+        self.submit = submit
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def add(self, chat_id, sender_id, data, timeout:float, on_complete):
+        """
+        this function registers message waiting for file. If sender already has message waiting for file
+        in this chat, previous message is completed without file
+        :param chat_id: chat id
+        :param sender_id: message sender id
+        :param data: parsed message
+        :param timeout: waiting time in seconds
+        :param on_complete: function called with parsed message when file is attached or waiting time is over
+        """
+        key = (chat_id, sender_id)
+        request = PendingAttachment(chat_id, sender_id, data, on_complete)
+        with self.lock:
+            previous = self.pending.pop(key, None)
+            self.pending[key] = request
+            request.timer = self.timer_wheel.schedule(timeout, lambda: self.expire(key, request))
+        if previous is not None:
+            self.timer_wheel.cancel(previous.timer)
+            previous.on_complete(previous.data)
+
+    def take(self, chat_id, sender_id) -> PendingAttachment:
+        """
+        this function removes message waiting for file from registry
+        :param chat_id: chat id
+        :param sender_id: file sender id
+        :return: message waiting for file or None if sender doesn't have such message
+        """
+        with self.lock:
+            request = self.pending.pop((chat_id, sender_id), None)
+        if request is not None:
+            self.timer_wheel.cancel(request.timer)
+        return request
+
+    def expire(self, key:tuple, request:PendingAttachment):
+        """
+        this function completes message without file when its waiting time is over
+        :param key: registry key
+        :param request: expired message
+        """
+        with self.lock:
+            if self.pending.get(key) is not request:
+                return  # file has been attached already
+            del self.pending[key]
+        if self.submit is None:
+            request.on_complete(request.data)
+        else:
+            # completion sends message, so it isn't run on timer thread which expires other messages
+            self.submit(request.chat_id, request.on_complete, request.data)
+
+    def __len__(self):
+        with self.lock:
+            return len(self.pending)
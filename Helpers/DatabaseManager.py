@@ -1,6 +1,17 @@
+import logging
 import psycopg2
+import psycopg2.errors
+import psycopg2.extensions
 import config as config
 import threading
+import time
+import uuid
+import weakref
+from contextlib import contextmanager
+from Helpers.Metrics import registry
+from Helpers.Statements import statements
+
+logger = logging.getLogger(__name__)
 
 class Singleton(type):
     """
@@ -14,13 +25,123 @@ class Singleton(type):
 
 class DatabaseManager(metaclass=Singleton):
     """
-    This class creates connection with PostgreSQL Database
+    This class creates pool of connections with PostgreSQL Database
     """
     def __init__(self):
-        print('DatabaseManager singleton created')
-        self.connection = psycopg2.connect(database=config.db_name, user='postgres',
-                                           password=config.db_user_password, host='127.0.0.1', port='5432')
-        self.lock = threading.Lock()
+        logger.info('DatabaseManager singleton created')
+        self.pool_min_size = getattr(config, 'db_pool_min_size', 1)
+        self.pool_max_size = getattr(config, 'db_pool_max_size', 10)
+        assert (0 <= self.pool_min_size <= self.pool_max_size)
+        # opened connections which are not used by any thread now
+        self.idle_connections = []
+        self.pool_lock = threading.Lock()
+        # number of connections which can be checked out. Threads wait on it when all connections are busy
+        self.free_connections = threading.BoundedSemaphore(self.pool_max_size)
+        # connection checked out by current thread and number of nested checkouts
+        self.thread_data = threading.local()
+        # names of statements which are already prepared on every connection
+        self.prepared_statements = weakref.WeakKeyDictionary()
+        self.wait_time = registry.histogram('db_pool_wait_seconds', 'Time spent waiting for free DB connection')
+        self.checkouts = registry.counter('db_pool_checkouts_total', 'Number of DB connection checkouts')
+        self.saturations = registry.counter('db_pool_saturated_total',
+                                            'Number of checkouts which had to wait because all connections were busy')
+        self.in_use = registry.gauge('db_pool_connections_in_use', 'Number of DB connections checked out now')
+        registry.gauge('db_pool_max_size', 'Max number of DB connections').set(self.pool_max_size)
+        # query time histograms by statement name
+        self.query_time = {}
+        for i in range(self.pool_min_size):
+            self.idle_connections.append(self.connect())
+
+    def connect(self):
+        """
+        this function opens new connection with DB
+        :return: DB connection
+        """
+        return psycopg2.connect(database=config.db_name, user='postgres',
+                                password=config.db_user_password, host='127.0.0.1', port='5432')
+
+    def get_connection(self):
+        """
+        this function takes idle connection from pool or opens new one
+        :return: DB connection
+        """
+        with self.pool_lock:
+            if self.idle_connections:
+                return self.idle_connections.pop()
+        return self.connect()
+
+    def put_connection(self, conn):
+        """
+        this function returns connection to pool. Broken connections are dropped
+        :param conn: DB connection
+        """
+        if not conn.closed:
+            status = conn.info.transaction_status
+            if status == psycopg2.extensions.TRANSACTION_STATUS_UNKNOWN:
+                conn.close()  # server connection lost
+                return
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            with self.pool_lock:
+                self.idle_connections.append(conn)
+
+    @contextmanager
+    def connection(self):
+        """
+        this function checks out connection from pool for current thread.
+        Nested checkouts in the same thread get the same connection
+        :return: DB connection
+        """
+        conn = getattr(self.thread_data, 'connection', None)
+        if conn is not None:
+            self.thread_data.depth += 1
+            try:
+                yield conn
+            finally:
+                self.thread_data.depth -= 1
+            return
+        start = time.perf_counter()
+        if not self.free_connections.acquire(blocking=False):
+            self.saturations.inc()
+            self.free_connections.acquire()
+        try:
+            conn = self.get_connection()
+        except Exception:
+            self.free_connections.release()
+            raise
+        self.wait_time.observe(time.perf_counter() - start)
+        self.checkouts.inc()
+        self.in_use.inc()
+        self.thread_data.connection = conn
+        self.thread_data.depth = 0
+        try:
+            yield conn
+        finally:
+            self.thread_data.connection = None
+            self.in_use.dec()
+            self.put_connection(conn)
+            self.free_connections.release()
+
+    @contextmanager
+    def transaction(self):
+        """
+        this function runs all queries executed in current thread inside its block in one transaction.
+        Transaction is commited at the end of the block or rolled back if exception is raised
+        """
+        with self.connection() as conn:
+            if getattr(self.thread_data, 'in_transaction', False):
+                yield conn
+                return
+            self.thread_data.in_transaction = True
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                if not conn.closed:
+                    conn.rollback()
+                raise
+            finally:
+                self.thread_data.in_transaction = False
 
     def execute_query(self, query:str, fetch=False):
         """
@@ -29,16 +150,108 @@ class DatabaseManager(metaclass=Singleton):
         :param fetch: True if query results should be fetched, False otherwise
         :return: query results or None
         """
-        with self.lock:
-            print('execute_query', query)
-            cursor = self.connection.cursor()
-            with cursor:
-                cursor.execute(query)
-                self.connection.commit()
-                if fetch:
-                    return cursor.fetchall()
-            return None
+        with self.connection() as conn:
+            logger.debug('execute_query %s', query)
+            in_transaction = getattr(self.thread_data, 'in_transaction', False)
+            try:
+                with self.get_query_time('query').span(), conn.cursor() as cursor:
+                    cursor.execute(query)
+                    res = cursor.fetchall() if fetch else None
+                if not in_transaction:
+                    conn.commit()
+                return res
+            except Exception:
+                if not in_transaction and not conn.closed:
+                    conn.rollback()
+                raise
+
+    def execute_statement(self, name:str, params=(), fetch=False):
+        """
+        this function executes named statement. Statement is prepared on first use with every connection
+        and after that only its parameters are sent to DB
+        :param name: statement name
+        :param params: statement parameters values
+        :param fetch: True if query results should be fetched, False otherwise
+        :return: query results or None
+        """
+        statement = statements[name]
+        assert (len(params) == statement.params_count)
+        with self.connection() as conn:
+            logger.debug('execute_statement %s %s', name, params)
+            in_transaction = getattr(self.thread_data, 'in_transaction', False)
+            prepared = self.prepared_statements.setdefault(conn, set())
+            try:
+                with self.get_query_time(name).span(), conn.cursor() as cursor:
+                    if name not in prepared:
+                        cursor.execute(statement.get_prepare_query())
+                        prepared.add(name)
+                    cursor.execute(statement.get_execute_query(), params)
+                    res = cursor.fetchall() if fetch else None
+                if not in_transaction:
+                    conn.commit()
+                return res
+            except psycopg2.errors.InvalidSqlStatementName:
+                # statement has been deallocated on server (e.g. session was reset), so it should be prepared again
+                prepared.clear()
+                if in_transaction:
+                    raise
+                conn.rollback()
+                return self.execute_statement(name, params, fetch)
+            except Exception:
+                if not in_transaction and not conn.closed:
+                    conn.rollback()
+                raise
+
+    def iterate_statement(self, name:str, params=(), page_size:int=1000):
+        """
+        this function executes statement with server side cursor and yields its rows.
+        Rows are fetched from DB page by page, so the whole result is never loaded into memory
+        :param name: statement name
+        :param params: statement parameters values
+        :param page_size: number of rows fetched from DB at once
+        :return: generator of rows
+        """
+        statement = statements[name]
+        assert (len(params) == statement.params_count)
+        with self.transaction() as conn:
+            logger.debug('iterate_statement %s %s', name, params)
+            with conn.cursor(name='cursor_' + uuid.uuid4().hex) as cursor:
+                cursor.itersize = page_size
+                cursor.execute(statement.get_cursor_query(), {'p' + str(i + 1): value for i, value in enumerate(params)})
+                for row in cursor:
+                    yield row
+
+    def get_query_time(self, name:str):
+        """
+        this function returns histogram of statement execution time
+        :param name: statement name
+        :return: histogram
+        """
+        histogram = self.query_time.get(name)
+        if histogram is None:
+            histogram = registry.histogram('db_query_seconds', 'Time spent executing DB statements',
+                                           {'statement': name})
+            self.query_time[name] = histogram
+        return histogram
+
+    def get_pool_stats(self) -> dict:
+        """
+        this function returns connection pool usage statistics
+        :return: dict with pool size, connections in use, checkouts, saturations and wait times
+        """
+        return {
+            'min_size': self.pool_min_size,
+            'max_size': self.pool_max_size,
+            'in_use': self.in_use.value,
+            'idle': len(self.idle_connections),
+            'checkouts': self.checkouts.value,
+            'saturations': self.saturations.value,
+            'wait_count': self.wait_time.count,
+            'wait_total': self.wait_time.sum,
+            'wait_max': self.wait_time.max,
+        }
 
     def __del__(self):
-        self.connection.close()
-        print('DatabaseConnector singleton removed')
+        for conn in self.idle_connections:
+            conn.close()
+        logger.debug('DatabaseConnector singleton removed')
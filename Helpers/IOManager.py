@@ -1,7 +1,14 @@
-import threading
-import datetime as dt
-import codecs
+import itertools
+import json
+import logging
 import os
+import time
+import uuid
+import config
+from Helpers.MessageTransport import create_transport
+from Helpers.Metrics import registry
+
+logger = logging.getLogger(__name__)
 
 class Data:
     """
@@ -15,35 +22,160 @@ class Data:
         self.mentioned_user_ids = []
         self.msg = ''
         self.attachment_name = ''
-        self.attachment = None
+        self.attachment_file = ''  # attachment file name in spool
 
-    def remove_whitespaces(self):
+    def to_record(self) -> dict:
         """
-        this function removes whitespaces from field values
+        this function returns fields which are written to spool
         """
-        self.sender_name = self.sender_name.strip()
-        self.group_name = self.group_name.strip()
-        self.group_id = self.group_id.strip()
-        self.attachment_name = self.attachment_name.strip()
-        self.msg = self.msg.strip()
-        for i in range(len(self.mentioned_user_ids)):
-            self.mentioned_user_ids[i] = self.mentioned_user_ids[i].strip()
+        return {
+            'sender_id': self.sender_id,
+            'sender_name': self.sender_name,
+            'group_name': self.group_name,
+            'group_id': self.group_id,
+            'mentioned_user_ids': self.mentioned_user_ids,
+            'msg': self.msg,
+            'attachment_name': self.attachment_name,
+            'attachment_file': self.attachment_file,
+        }
+
+    def load_record(self, record:dict):
+        """
+        this function fills fields with values read from spool
+        :param record: dict created by to_record
+        """
+        for key, value in record.items():
+            setattr(self, key, value)
 
     def to_str(self):
         return self.sender_name + ' sent you message from group ' + "'" + self.group_name + "'" + ':\n' + \
                ('In addition this file was attached:' if self.attachment_name != '' else '')
 
+class AttachmentSizeError(RuntimeError):
+    """
+    This class represents error raised when attachment is bigger than allowed
+    """
+    pass
+
 class IOManager:
     """
-    This class represents input/output manager for data
+    This class represents input/output manager for data.
+    Every message is written to spool directory as separate file with one JSON line.
+    Files are written under temporary name and renamed when they are complete,
+    so reader never sees partially written messages
     """
-    def __init__(self):
-        self.lock = threading.Lock()
-        self.lock2 = threading.Lock()
-        self.path = 'D:/message_storage/'
+    message_suffix = '.msg'
+    attachment_suffix = '.att'
+    temp_suffix = '.tmp'
+    chunk_size = 64 * 1024
+    # number of file created by this process. Clock can be too coarse to order files written one after another
+    sequence = itertools.count()
+
+    def __init__(self, receiver=False):
+        """
+        :param receiver: True if manager reads messages, False if it writes them
+        """
+        self.path = getattr(config, 'message_storage_path', 'D:/message_storage/')
         exists = os.path.exists(self.path)
         if not exists:
             os.makedirs(self.path)
+        self.transport = create_transport(receiver)
+        # temporary files older than this age are left by crashed writers
+        self.temp_max_age = getattr(config, 'spool_temp_max_age', 3600)
+        self.remove_stale_temp_files()
+        self.write_time = registry.histogram('spool_write_seconds', 'Time spent writing messages to spool')
+        self.read_time = registry.histogram('spool_read_seconds', 'Time spent reading messages from spool')
+        self.attachment_write_time = registry.histogram('spool_attachment_write_seconds',
+                                                        'Time spent writing attachments to spool')
+
+    def create_file_name(self) -> str:
+        """
+        this function creates unique spool file name. Names are sorted in order they were created:
+        files written in one clock tick are sorted by process sequence number
+        """
+        return '{0:020d}_{1:012d}_{2}'.format(time.time_ns(), next(self.sequence), uuid.uuid4().hex)
+
+    def write_file_atomically(self, file:str, content:bytes):
+        """
+        this function writes file to spool under temporary name and renames it when it is complete
+        :param file: file name
+        :param content: file content
+        """
+        temp_location = os.path.join(self.path, file + self.temp_suffix)
+        with open(temp_location, 'wb') as f:
+            f.write(content)
+            self.sync_file(f)
+        os.replace(temp_location, os.path.join(self.path, file))
+        self.sync_directory()
+
+    def sync_file(self, f):
+        """
+        this function writes file content to disk, so renamed file is complete even after power loss
+        :param f: opened file
+        """
+        f.flush()
+        os.fsync(f.fileno())
+
+    def sync_directory(self):
+        """
+        this function writes spool directory entries to disk, so renamed file is not lost after power loss.
+        Directories can't be opened on Windows, there rename is written by file system itself
+        """
+        if os.name == 'nt':
+            return
+        fd = os.open(self.path, os.O_RDONLY)
+        try:
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def remove_stale_temp_files(self):
+        """
+        this function removes temporary files left in spool by writers which crashed before renaming them
+        """
+        now = time.time()
+        with os.scandir(self.path) as entries:
+            for entry in entries:
+                if not entry.name.endswith(self.temp_suffix):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime > self.temp_max_age:
+                        os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+    def write_attachment(self, chunks, max_size:int) -> str:
+        """
+        this function writes attachment to spool chunk by chunk, so attachment is never fully loaded into memory
+        :param chunks: iterable of attachment bytes chunks
+        :param max_size: max attachment size in bytes
+        :return: attachment file name in spool
+        """
+        file = self.create_file_name() + self.attachment_suffix
+        temp_location = os.path.join(self.path, file + self.temp_suffix)
+        size = 0
+        try:
+            with self.attachment_write_time.span(), open(temp_location, 'wb') as f:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if size > max_size:
+                        raise AttachmentSizeError('Attachment is bigger than {0} bytes'.format(max_size))
+                    f.write(chunk)
+                self.sync_file(f)
+            os.replace(temp_location, os.path.join(self.path, file))
+            self.sync_directory()
+        except BaseException:
+            if os.path.exists(temp_location):
+                os.remove(temp_location)
+            raise
+        return file
+
+    def list_message_files(self) -> list[str]:
+        """
+        this function returns names of messages files in spool in order they were written
+        """
+        with os.scandir(self.path) as entries:
+            return sorted(entry.name for entry in entries if entry.name.endswith(self.message_suffix))
 
     def read_message_from_file(self, file:str) -> Data:
         """
@@ -51,49 +183,30 @@ class IOManager:
         :param file: file name
         :return: filled Data structure
         """
-        with self.lock2:
-            read_data = Data()
-            with open(os.path.join(self.path + file), 'r', encoding='utf-8') as f:
-                read_data.sender_name = f.readline()
-                read_data.group_name = f.readline()
-                read_data.group_id = f.readline()
-                mentioned_cnt = int((f.readline()).strip())
-                for i in range(mentioned_cnt):
-                    read_data.mentioned_user_ids.append(f.readline())
-                read_data.msg = f.readline()
-                if f.readline().strip() == '1':
-                    attachment_name = f.readline()
-                    read_data.attachment_name = attachment_name
-            os.remove(self.path + file)
-            read_data.remove_whitespaces()
-            return read_data
+        read_data = Data()
+        with self.read_time.span(), open(os.path.join(self.path, file), 'r', encoding='utf-8') as f:
+            read_data.load_record(json.loads(f.readline()))
+        return read_data
+
+    def remove_message_file(self, file:str):
+        """
+        this function removes message file from spool. File which is already removed is ignored
+        :param file: file name
+        """
+        try:
+            os.remove(os.path.join(self.path, file))
+        except FileNotFoundError:
+            pass
 
     def write_message_to_file(self, out:Data):
         """
         this function writes message data which should be sent to file
         :param out: data structure to write info from
         """
-        with self.lock:
-            ts = dt.datetime.now()
-            time = ts.strftime("%m_%d_%Y_%H_%M_%S")
-            f = codecs.open(self.path + time + ".txt", 'w', 'utf-8')
-            f.write(out.sender_name + '\n')
-            f.write(out.group_name + '\n')
-            f.write(out.group_id + '\n')
-            # live:.cid.b7c39b3e0953931c
-            #f.write('1' + '\n')
-            #f.write('live:.cid.b7c39b3e0953931c' + '\n')
-            f.write(str(len(out.mentioned_user_ids)) + '\n')
-            for user_id in out.mentioned_user_ids:
-                f.write(str(user_id) + '\n')
-            print('msg = ', out.msg)
-            f.write(out.msg + '\n')
-            if out.attachment_name != '':
-                f.write('1' + '\n')
-                attachment_file_name = str(time) + '_' + out.attachment_name
-                f.write(attachment_file_name)
-                with open(os.path.join(self.path + attachment_file_name), "wb") as f2:
-                    f2.write(out.attachment)
-            else:
-                f.write('0')
-            f.close()
+        # attachment is written by write_attachment before message, so it is already in spool when reader gets message
+        name = self.create_file_name()
+        logger.debug('msg = %s', out.msg)
+        with self.write_time.span():
+            record = json.dumps(out.to_record(), ensure_ascii=False) + '\n'
+            self.write_file_atomically(name + self.message_suffix, record.encode('utf-8'))
+        self.transport.notify()
@@ -0,0 +1,86 @@
+import threading
+from collections import OrderedDict
+
+class LRUCache:
+    """
+    This class represents thread safe key-value cache with bounded size and least recently used eviction
+    """
+    def __init__(self, max_size:int):
+        """
+        :param max_size: max number of entries kept in cache
+        """
+        assert (max_size > 0)
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        """
+        this function returns cached value and marks it as recently used
+        :param key: entry key
+        :param default: value returned if there is no such key in cache
+        :return: cached value or default
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        this function adds value to cache and evicts least recently used entries if cache is full
+        :param key: entry key
+        :param value: entry value
+        """
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def remove(self, key):
+        """
+        this function removes entry from cache if it is present
+        :param key: entry key
+        """
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        """
+        this function removes all entries from cache
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def items(self) -> list:
+        """
+        this function returns copy of cache entries from least to most recently used
+        :return: list of (key, value) pairs
+        """
+        with self.lock:
+            return list(self.entries.items())
+
+    def stats(self) -> dict:
+        """
+        this function returns cache usage counters
+        :return: dict with size, hits, misses and evictions
+        """
+        with self.lock:
+            return {'size': len(self.entries), 'max_size': self.max_size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+    def __contains__(self, key):
+        with self.lock:
+            return key in self.entries
+
+    def __len__(self):
+        with self.lock:
+            return len(self.entries)
@@ -0,0 +1,104 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import config
+from Helpers.Metrics import registry
+
+class JsonFormatter(logging.Formatter):
+    """
+    This class represents formatter which writes every log record as one JSON line
+    """
+    def format(self, record:logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    This class represents handler which puts log records into bounded queue without waiting.
+    Records which don't fit into full queue are dropped and counted, so logging never blocks caller thread
+    """
+    def __init__(self, records_queue:queue.Queue):
+        super().__init__(records_queue)
+        self.dropped = registry.counter('log_records_dropped_total', 'Number of log records dropped on full queue')
+        registry.gauge('log_queue_depth', 'Number of log records waiting to be written')\
+            .set_function(records_queue.qsize)
+
+    def prepare(self, record:logging.LogRecord) -> logging.LogRecord:
+        """
+        this function makes record safe to pass to other thread: message arguments and exception are
+        converted to text, so formatter of file handler still can write them separately
+        """
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record:logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped.inc()
+
+# listener of this process, it writes records from queue to file
+listener = None
+listener_lock = threading.Lock()
+
+def create_file_handler(log_name:str) -> logging.Handler:
+    """
+    this function creates file handler which rotates log by size or by time, depending on config log_rotation
+    :param log_name: path to log file
+    :return: file handler
+    """
+    backup_count = getattr(config, 'log_backup_count', 5)
+    if getattr(config, 'log_rotation', 'size') == 'time':
+        handler = logging.handlers.TimedRotatingFileHandler(log_name, getattr(config, 'log_rotation_when', 'midnight'),
+                                                            backupCount=backup_count, encoding='utf-8')
+    else:
+        handler = logging.handlers.RotatingFileHandler(log_name, maxBytes=getattr(config, 'log_max_bytes',
+                                                                                  10 * 1024 * 1024),
+                                                       backupCount=backup_count, encoding='utf-8')
+    if getattr(config, 'log_format', 'text') == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+    return handler
+
+def configure_logging(log_name:str) -> logging.Logger:
+    """
+    this function sets up logging of process: root logger puts records into queue and one listener thread
+    writes them to rotating log file. Only the first call configures logging, next calls return root logger
+    :param log_name: path to log file, config log_file overrides it
+    :return: root logger
+    """
+    global listener
+    logger = logging.getLogger()
+    with listener_lock:
+        if listener is not None:
+            return logger
+        # per call messages are logged with DEBUG level, so they cost nothing unless log_level is DEBUG
+        logger.setLevel(getattr(config, 'log_level', 'INFO'))
+        records_queue = queue.Queue(getattr(config, 'log_queue_size', 10000))
+        file_handler = create_file_handler(getattr(config, 'log_file', log_name))
+        listener = logging.handlers.QueueListener(records_queue, file_handler, respect_handler_level=True)
+        listener.start()
+        logger.addHandler(NonBlockingQueueHandler(records_queue))
+        # records left in queue are written before process exits
+        atexit.register(listener.stop)
+    return logger
@@ -0,0 +1,48 @@
+import threading
+import time
+from Helpers.LRUCache import LRUCache
+
+class MembershipCache:
+    """
+    This class represents cache of chats members. Members are loaded with given function and kept until
+    their time to live is over or chat members change event invalidates them
+    """
+    def __init__(self, loader, ttl:float=300, max_chats:int=10000):
+        """
+        :param loader: function which loads chat members by chat id
+        :param ttl: time in seconds members are kept in cache
+        :param max_chats: max number of chats which members are kept in cache
+        """
+        self.loader = loader
+        self.ttl = ttl
+        self.entries = LRUCache(max_chats)
+        # chat id -> number of invalidations. Members loaded before invalidation are not put into cache
+        self.generations = LRUCache(max_chats)
+        self.lock = threading.Lock()
+
+    def get_members(self, chat_id):
+        """
+        this function returns chat members from cache or loads them
+        :param chat_id: chat id
+        :return: chat members as returned by loader
+        """
+        key = str(chat_id)
+        entry = self.entries.get(key)
+        now = time.monotonic()
+        if entry is None or entry[0] <= now:
+            generation = self.generations.get(key, 0)
+            entry = (now + self.ttl, self.loader(chat_id))
+            with self.lock:
+                if self.generations.get(key, 0) == generation:
+                    self.entries.put(key, entry)
+        return entry[1]
+
+    def invalidate(self, chat_id):
+        """
+        this function removes chat members from cache, so they are loaded again on next use
+        :param chat_id: chat id
+        """
+        key = str(chat_id)
+        with self.lock:
+            self.generations.put(key, self.generations.get(key, 0) + 1)
+            self.entries.remove(key)
@@ -1,88 +1,258 @@
 from Bots import TelegramBot
 from Helpers.IOManager import IOManager, Data
+from Helpers.MultipartStream import MultipartStream
+from Helpers.OutboundScheduler import MessagePriority
+from Helpers.WorkerPool import KeyedWorkerPool
+from telebot.apihelper import ApiTelegramException, ApiHTTPException
+from concurrent.futures import Future
 from threading import Thread
-import time
-import re
-import pathlib
+import logging
+import threading
 import os
 import config as config
-import requests
+
+logger = logging.getLogger(__name__)
+
+def copy_future_result(source:Future, target:Future):
+    """
+    this function sets result or exception of finished future to other future
+    :param source: finished future
+    :param target: future to set result to
+    """
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
 
 class MessageSendingManager(IOManager, Thread):
     """
-    This class represents manager for sending messages to users` Telegram chats with bot
+    This class represents manager for sending messages to users` Telegram chats with bot.
+    Only one manager may send spool: files being sent are tracked in memory of its process
     """
     def __init__(self, bot:TelegramBot.TelegramBot):
-        IOManager.__init__(self)
+        IOManager.__init__(self, receiver=True)
         Thread.__init__(self)
         self.bot_ref = bot
+        # spool is scanned at least once in this period even if no notification was received
+        self.poll_period = getattr(config, 'message_poll_period', 5)
+        # messages to different users are sent in parallel, messages to one user are sent in order
+        self.delivery_pool = KeyedWorkerPool(getattr(config, 'delivery_workers', 8), 'delivery')
+        self.api_url = getattr(config, 'telegram_api_url', None) or 'https://api.telegram.org/bot{0}/{1}'
+        # (connect, read) timeouts of API calls in seconds. Timed out calls are retried by scheduler
+        self.api_timeout = (getattr(config, 'telegram_connect_timeout', 10),
+                            getattr(config, 'telegram_read_timeout', 60))
+        self.upload_timeout = (self.api_timeout[0], getattr(config, 'telegram_upload_timeout', 300))
+        # messages files which are being sent now. They are removed from spool when all users got message
+        self.files_in_progress = set()
+        self.files_lock = threading.Lock()
         self.start()
 
     def run(self):
         while True:
-            for filename in os.listdir(self.path):
-                file = os.path.join(self.path, filename)
-                # parse only txt files
-                # pattern is %m_%d_%Y_%H_%M_%S
-                if os.path.isfile(file) and pathlib.Path(file).suffix == '.txt' \
-                        and re.search(r'\d{2}_\d{2}_\d{4}_\d{2}_\d{2}_\d{2}', filename) is not None:
-                    print(file)
-                    data = self.read_message_from_file(filename)
-                    # get user ids who subscribed on message resending from group data.group_id
-                    # and who don't have this group in blacklist
-                    query = "select c.user_id from user_and_skype_chats c " \
-                            "inner join system_user s on s.user_id = c.user_id " \
-                            "where c.chat_link = '" + str(data.group_id) + "' and c.is_in_blacklist = 'n'"
-                    res = self.bot_ref.db_manager.execute_query(query, fetch=True)
-                    print(res)
-                    if res:
-                        try:
-                            res = self.get_mentioned_users_tg_ids(res, data)
-                            self.send_message_to_mentioned_users(res, data)
-                        except Exception as e:
-                            self.bot_ref.logger.error(str(e))
-
-            time.sleep(5)
-
-    def get_mentioned_users_tg_ids(self, query_res, data:Data):
-        """
-        this function gets users Telegram ids from query result
-        :param query_res: select query result
-        :param data: data structure with read information from file
-        :return: query result with mentioned user ids
-        """
-        mentioned_users_ids = ''
-        for r in query_res:
-            mentioned_users_ids += str(r[0]) + ', '
-        mentioned_users_ids = mentioned_users_ids.removesuffix(', ')
-        mentioned_users_str = ''
-        for user_id in data.mentioned_user_ids:
-            mentioned_users_str += user_id + ', '
-        mentioned_users_str = mentioned_users_str.removesuffix(', ')
-        query = "select tg_id from system_user where user_id in ({0}) and skype_id in ('{1}')" \
-            .format(mentioned_users_ids, mentioned_users_str)
-        return self.bot_ref.db_manager.execute_query(query, fetch=True)
-
-    def send_message_to_mentioned_users(self, query_res, data:Data):
+            try:
+                self.send_spooled_messages()
+            except Exception as e:
+                self.bot_ref.logger.error('spool scan failed: ' + str(e))
+            self.transport.wait(self.poll_period)
+
+    def send_spooled_messages(self):
+        """
+        this function starts sending all messages which are in spool now
+        """
+        for filename in self.list_message_files():
+            with self.files_lock:
+                if filename in self.files_in_progress:
+                    continue
+                self.files_in_progress.add(filename)
+            # file could be sent and removed after spool was listed
+            if not os.path.exists(os.path.join(self.path, filename)):
+                with self.files_lock:
+                    self.files_in_progress.discard(filename)
+                continue
+            try:
+                self.send_spooled_message(filename)
+            except Exception as e:
+                self.bot_ref.logger.error('sending of {0} failed: {1}'.format(filename, e))
+                with self.files_lock:
+                    self.files_in_progress.discard(filename)
+
+    def send_spooled_message(self, filename:str):
+        """
+        this function starts sending message from spool file to mentioned users
+        :param filename: message file name
+        """
+        logger.debug('sending spooled message %s', filename)
+        data = None
+        futures = []
+        try:
+            data = self.read_message_from_file(filename)
+            # get mentioned users who subscribed on message resending from group data.group_id
+            # and who don't have this group in blacklist
+            tg_ids = self.bot_ref.db_manager.get_recipients_tg_ids(data.group_id, data.mentioned_user_ids)
+            logger.debug('recipients %s', tg_ids)
+            if tg_ids:
+                futures = self.send_message_to_mentioned_users(tg_ids, data)
+        except Exception as e:
+            self.bot_ref.logger.error(str(e))
+        self.remove_files_when_sent(filename, data, futures)
+
+    def remove_files_when_sent(self, filename:str, data:Data, futures:list):
+        """
+        this function removes message file and its attachment from spool when message has been sent to all users
+        :param filename: message file name
+        :param data: data structure with read information from file. None if file hasn't been read
+        :param futures: futures of sending message to every user
+        """
+        pending = [len(futures)]
+        lock = threading.Lock()
+
+        def remove_files():
+            if data is not None and data.attachment_file != '':
+                self.remove_message_file(data.attachment_file)
+            self.remove_message_file(filename)
+            with self.files_lock:
+                self.files_in_progress.discard(filename)
+
+        def on_sent(future):
+            if future.exception() is not None:
+                self.bot_ref.logger.error(str(future.exception()))
+            with lock:
+                pending[0] -= 1
+                if pending[0] != 0:
+                    return
+            remove_files()
+
+        if not futures:
+            remove_files()
+        for future in futures:
+            future.add_done_callback(on_sent)
+
+    def send_message_to_mentioned_users(self, tg_ids:list, data:Data) -> list:
         """
         this function sends read message from file to mentioned users in it to their private chats in Telegram
-        :param query_res: select query result
+        :param tg_ids: mentioned users Telegram ids
+        :param data: data structure with read information from file
+        :return: futures of sending message to every user
+        """
+        header = data.to_str()
+        languages = {tg_id: self.bot_ref.get_chat_language(tg_id) for tg_id in tg_ids}
+        # translate message header once per language instead of once per user
+        headers = {lang: self.bot_ref.translate_text(header, 'en', lang) for lang in set(languages.values())}
+        futures = [self.delivery_pool.submit(tg_id, self.send_message_to_user, tg_id,
+                                             headers[languages[tg_id]] + '\n' + data.msg)
+                   for tg_id in tg_ids]
+        if data.attachment_name != '':
+            futures += self.send_attachment_to_users(tg_ids, data)
+        return futures
+
+    def send_message_to_user(self, tg_id, text:str):
+        """
+        this function sends message to user's private chat in Telegram
+        :param tg_id: user's Telegram id
+        :param text: message text with translated header
+        """
+        logger.debug('sending message to %s', tg_id)
+        # calls wait for results, so the next message to this user isn't sent before the current one
+        self.bot_ref.send_message(tg_id, text, priority=MessagePriority.BULK)
+
+    def send_attachment_to_users(self, tg_ids:list, data:Data) -> list:
+        """
+        this function sends message attachment to users. Attachment is uploaded only once, other users get it
+        by Telegram file id when upload is done, so no delivery worker waits for upload
+        :param tg_ids: users Telegram ids
+        :param data: data structure with read information from file
+        :return: futures of sending attachment to every user
+        """
+        futures = [Future() for tg_id in tg_ids]
+        self.upload_attachment(tg_ids, futures, data, 0)
+        return futures
+
+    def upload_attachment(self, tg_ids:list, futures:list, data:Data, index:int):
+        """
+        this function uploads attachment to user and sends it by file id to users after him when upload is done.
+        If upload failed, the next user tries to upload attachment
+        :param tg_ids: users Telegram ids
+        :param futures: futures of sending attachment to every user
+        :param data: data structure with read information from file
+        :param index: index of user attachment is uploaded to
+        """
+        tg_id = tg_ids[index]
+
+        def on_uploaded(upload:Future):
+            if upload.exception() is not None:
+                futures[index].set_exception(upload.exception())
+                if index + 1 < len(tg_ids):
+                    self.upload_attachment(tg_ids, futures, data, index + 1)
+                return
+            futures[index].set_result(None)
+            file_id = upload.result()
+            for i in range(index + 1, len(tg_ids)):
+                future = self.delivery_pool.submit(tg_ids[i], self.send_document_by_file_id, tg_ids[i], file_id)
+                future.add_done_callback(lambda f, target=futures[i]: copy_future_result(f, target))
+
+        # upload is queued after message text to this user
+        self.delivery_pool.submit(tg_id, self.upload_document_to_user, tg_id, data).add_done_callback(on_uploaded)
+
+    def upload_document_to_user(self, tg_id, data:Data) -> str:
+        """
+        this function uploads message attachment to user's private chat in Telegram
+        :param tg_id: user's Telegram id
+        :param data: data structure with read information from file
+        :return: Telegram file id of uploaded attachment
+        """
+        result = self.bot_ref.scheduler.call(tg_id, MessagePriority.BULK, self.upload_document, tg_id, data)
+        return self.get_file_id(result)
+
+    def send_document_by_file_id(self, tg_id, file_id:str):
+        """
+        this function sends already uploaded attachment to user's private chat in Telegram
+        :param tg_id: user's Telegram id
+        :param file_id: Telegram file id of attachment
+        """
+        self.bot_ref.scheduler.call(tg_id, MessagePriority.BULK, self.call_api_method, 'sendDocument',
+                                    {'chat_id': str(tg_id), 'document': file_id})
+
+    def upload_document(self, tg_id, data:Data) -> dict:
+        """
+        this function uploads message attachment to user's private chat in Telegram
+        :param tg_id: user's Telegram id
         :param data: data structure with read information from file
+        :return: sent message
+        """
+        # file is streamed from disk while it's being uploaded
+        body = MultipartStream({'chat_id': str(tg_id)}, 'document', data.attachment_name,
+                               os.path.join(self.path, data.attachment_file))
+        return self.call_api_method('sendDocument', body, {'Content-Type': body.get_content_type()},
+                                    self.upload_timeout)
+
+    def call_api_method(self, method:str, req_data, headers:dict=None, timeout:tuple=None) -> dict:
+        """
+        this function calls Telegram Bot API method using bot's keep-alive HTTP session
+        :param method: method name
+        :param req_data: method parameters or request body
+        :param headers: additional request headers
+        :param timeout: (connect, read) timeouts in seconds. api_timeout is used if None
+        :return: method result
+        """
+        url = self.api_url.format(config.tg_bot_token, method)
+        response = self.bot_ref.http_session.post(url, data=req_data, headers=headers,
+                                                  timeout=timeout or self.api_timeout)
+        try:
+            result_json = response.json()
+        except ValueError:
+            raise ApiHTTPException(method, response)
+        if not result_json.get('ok'):
+            raise ApiTelegramException(method, response, result_json)
+        return result_json['result']
+
+    def get_file_id(self, message:dict) -> str:
+        """
+        this function gets file id of document sent in message
+        :param message: sent message
+        :return: Telegram file id
         """
-        for tg_id in query_res:
-            print('sending ...')
-            text = self.bot_ref.translate_text(data.to_str(), 'en', self.bot_ref.get_chat_language(tg_id[0]))
-            self.bot_ref.send_message(tg_id[0], text + '\n' + data.msg)
-            # self.bot_ref.send_message(tg_id[0], str(data) + ('\nIn addition this file was attached:' if data.attachment_name != '' else ''))
-            if data.attachment_name != '':
-                file_location = self.path + data.attachment_name
-                with open(file_location, "rb") as at:
-                    send_doc = 'https://api.telegram.org/bot' + config.tg_bot_token + '/sendDocument?'
-                    req_data = {
-                        'chat_id': str(tg_id[0])
-                    }
-                    files = {
-                        'document': at
-                    }
-                    requests.post(send_doc, data=req_data, files=files)
-                os.remove(self.path + data.attachment_name)
+        # Telegram may recognize document as other media type
+        for media_type in ['document', 'animation', 'video', 'audio', 'voice', 'sticker']:
+            if media_type in message:
+                return message[media_type]['file_id']
+        raise RuntimeError('Sent message has no document')
@@ -0,0 +1,81 @@
+import select
+import socket
+import time
+import config
+
+class MessageTransport:
+    """
+    This class represents channel which tells messages reader that new messages were written to spool.
+    Base transport doesn't notify at all, so reader just polls spool
+    """
+    def notify(self):
+        """
+        this function tells reader that new message was written
+        """
+        pass
+
+    def wait(self, timeout:float) -> bool:
+        """
+        this function waits for new messages notification
+        :param timeout: max waiting time in seconds
+        :return: True if notification was received, False if timeout expired
+        """
+        time.sleep(timeout)
+        return False
+
+    def close(self):
+        """
+        this function releases transport resources
+        """
+        pass
+
+class SocketTransport(MessageTransport):
+    """
+    This class represents transport which sends notifications as UDP datagrams to local port
+    """
+    def __init__(self, port:int, receiver:bool):
+        """
+        :param port: local port reader listens to
+        :param receiver: True if transport is used by reader, False if it is used by writer
+        """
+        self.address = ('127.0.0.1', port)
+        self.receiver = receiver
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        if receiver:
+            self.sock.bind(self.address)
+            self.sock.setblocking(False)
+
+    def notify(self):
+        try:
+            self.sock.sendto(b'1', self.address)
+        except OSError:
+            pass  # reader is not running. Message stays in spool until reader polls it
+
+    def wait(self, timeout:float) -> bool:
+        assert self.receiver
+        readable, _, _ = select.select([self.sock], [], [], timeout)
+        if not readable:
+            return False
+        # several messages may have been written, but one spool scan is enough for all of them
+        try:
+            while True:
+                self.sock.recv(16)
+        except (BlockingIOError, ConnectionResetError):
+            pass
+        return True
+
+    def close(self):
+        self.sock.close()
+
+def create_transport(receiver:bool) -> MessageTransport:
+    """
+    this function creates transport chosen in config
+    :param receiver: True if transport is used by reader, False if it is used by writer
+    :return: transport object
+    """
+    transport_type = getattr(config, 'message_transport', 'socket')
+    if transport_type == 'socket':
+        return SocketTransport(getattr(config, 'message_transport_port', 47800), receiver)
+    elif transport_type == 'spool':
+        return MessageTransport()
+    raise RuntimeError('Unknown message transport ' + str(transport_type))
@@ -0,0 +1,235 @@
+import threading
+import time
+from contextlib import contextmanager
+
+class Counter:
+    """
+    This class represents metric which value can only grow
+    """
+    def __init__(self, name:str, description:str, labels:dict):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.value = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set_function(self, function):
+        """
+        this function makes counter take its value from given function when metrics are collected,
+        e.g. from counter kept by other object. Function values should never decrease
+        :param function: function without arguments which returns counter value
+        """
+        self.function = function
+
+    def get_value(self):
+        """
+        this function returns current counter value
+        """
+        return self.function() if self.function is not None else self.value
+
+    def inc(self, amount=1):
+        """
+        this function increases counter value
+        :param amount: value to add
+        """
+        with self.lock:
+            self.value += amount
+
+class Gauge:
+    """
+    This class represents metric which value can go up and down
+    """
+    def __init__(self, name:str, description:str, labels:dict):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.value = 0
+        self.function = None
+        self.lock = threading.Lock()
+
+    def set_function(self, function):
+        """
+        this function makes gauge take its value from given function when metrics are collected
+        :param function: function without arguments which returns gauge value
+        """
+        self.function = function
+
+    def get_value(self):
+        """
+        this function returns current gauge value
+        """
+        return self.function() if self.function is not None else self.value
+
+    def set(self, value):
+        """
+        this function sets gauge value
+        :param value: new value
+        """
+        with self.lock:
+            self.value = value
+
+    def inc(self, amount=1):
+        """
+        this function increases gauge value
+        :param amount: value to add
+        """
+        with self.lock:
+            self.value += amount
+
+    def dec(self, amount=1):
+        """
+        this function decreases gauge value
+        :param amount: value to subtract
+        """
+        with self.lock:
+            self.value -= amount
+
+class Histogram:
+    """
+    This class represents metric which counts observed values in buckets
+    """
+    default_buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, name:str, description:str, labels:dict, buckets=None):
+        self.name = name
+        self.description = description
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets)) if buckets else self.default_buckets
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value:float):
+        """
+        this function adds observed value to histogram
+        :param value: observed value
+        """
+        with self.lock:
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+            for i in range(len(self.buckets)):
+                if value <= self.buckets[i]:
+                    self.bucket_counts[i] += 1
+                    break
+
+    @contextmanager
+    def span(self):
+        """
+        this function observes time spent in with block
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def snapshot(self) -> tuple:
+        """
+        this function returns consistent state of histogram
+        :return: cumulative counts for each bucket, number of observed values and their sum
+        """
+        with self.lock:
+            return self.cumulative_counts(), self.count, self.sum
+
+    def cumulative_counts(self) -> list[int]:
+        """
+        this function returns number of observed values which are less or equal to every bucket bound
+        :return: list of counts for each bucket
+        """
+        counts = []
+        total = 0
+        for count in list(self.bucket_counts):
+            total += count
+            counts.append(total)
+        return counts
+
+class MetricsRegistry:
+    """
+    This class represents storage of all process metrics
+    """
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+
+    def get_or_create(self, metric_class, name:str, description:str, labels:dict=None, **kwargs):
+        """
+        this function returns already registered metric or registers new one
+        :param metric_class: Counter, Gauge or Histogram
+        :param name: metric name
+        :param description: metric description
+        :param labels: metric labels
+        :return: metric object
+        """
+        labels = labels or {}
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = metric_class(name, description, labels, **kwargs)
+                self.metrics[key] = metric
+            assert isinstance(metric, metric_class)
+            return metric
+
+    def counter(self, name:str, description:str, labels:dict=None) -> Counter:
+        return self.get_or_create(Counter, name, description, labels)
+
+    def gauge(self, name:str, description:str, labels:dict=None) -> Gauge:
+        return self.get_or_create(Gauge, name, description, labels)
+
+    def histogram(self, name:str, description:str, labels:dict=None, buckets=None) -> Histogram:
+        return self.get_or_create(Histogram, name, description, labels, buckets=buckets)
+
+    def collect(self) -> list:
+        """
+        this function returns all registered metrics
+        :return: list of metrics
+        """
+        with self.lock:
+            return list(self.metrics.values())
+
+    def render(self) -> str:
+        """
+        this function returns all registered metrics in Prometheus text format
+        """
+        families = {}
+        for metric in self.collect():
+            families.setdefault(metric.name, []).append(metric)
+        lines = []
+        for name, metrics in families.items():
+            lines.append('# HELP {0} {1}'.format(name, escape_text(metrics[0].description)))
+            lines.append('# TYPE {0} {1}'.format(name, type(metrics[0]).__name__.lower()))
+            for metric in metrics:
+                if isinstance(metric, Histogram):
+                    counts, count, total = metric.snapshot()
+                    for bound, bucket_count in zip(metric.buckets, counts):
+                        lines.append('{0}_bucket{1} {2}'.format(name, format_labels(metric.labels, le=repr(bound)),
+                                                                bucket_count))
+                    lines.append('{0}_bucket{1} {2}'.format(name, format_labels(metric.labels, le='+Inf'), count))
+                    lines.append('{0}_sum{1} {2}'.format(name, format_labels(metric.labels), total))
+                    lines.append('{0}_count{1} {2}'.format(name, format_labels(metric.labels), count))
+                else:
+                    lines.append('{0}{1} {2}'.format(name, format_labels(metric.labels), metric.get_value()))
+        return '\n'.join(lines) + '\n'
+
+def escape_text(text:str) -> str:
+    return str(text).replace('\\', '\\\\').replace('\n', '\\n')
+
+def format_labels(labels:dict, **extra) -> str:
+    """
+    this function formats metric labels for Prometheus text format
+    :param labels: metric labels
+    :param extra: additional labels, e.g. histogram bucket bound
+    :return: formatted labels or empty string if there are no labels
+    """
+    items = list(labels.items()) + list(extra.items())
+    if not items:
+        return ''
+    return '{' + ','.join('{0}="{1}"'.format(key, escape_text(value).replace('"', '\\"'))
+                          for key, value in items) + '}'
+
+# metrics registry shared by whole process
+registry = MetricsRegistry()
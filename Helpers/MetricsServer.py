@@ -0,0 +1,47 @@
+import logging
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from Helpers.Metrics import registry
+
+logger = logging.getLogger(__name__)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """
+    This class represents handler of Prometheus scrape requests
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        data = registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+# metrics server of this process
+server = None
+server_lock = threading.Lock()
+
+def start_metrics_server(port:int, host:str='127.0.0.1') -> ThreadingHTTPServer:
+    """
+    this function starts HTTP server which exposes process metrics on /metrics.
+    Only one server is started in process, next calls return already started server
+    :param port: port server listens on
+    :param host: address server listens on
+    :return: metrics server
+    """
+    global server
+    with server_lock:
+        if server is None:
+            server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True).start()
+            logger.info('Metrics are exposed on http://%s:%s/metrics', host, server.server_port)
+        return server
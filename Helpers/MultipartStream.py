@@ -0,0 +1,48 @@
+import os
+import uuid
+
+class MultipartStream:
+    """
+    This class represents multipart/form-data request body with one file which is read from disk in chunks
+    while request is being sent, so the whole file is never loaded into memory
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, fields:dict, file_field:str, file_name:str, file_path:str):
+        """
+        :param fields: form fields
+        :param file_field: name of form field with file
+        :param file_name: file name sent to server
+        :param file_path: path to file on disk
+        """
+        self.boundary = uuid.uuid4().hex
+        preamble = ''
+        for name, value in fields.items():
+            preamble += '--{0}\r\nContent-Disposition: form-data; name="{1}"\r\n\r\n{2}\r\n'\
+                .format(self.boundary, name, value)
+        preamble += '--{0}\r\nContent-Disposition: form-data; name="{1}"; filename="{2}"\r\n' \
+                    'Content-Type: application/octet-stream\r\n\r\n'\
+            .format(self.boundary, file_field, file_name.replace('"', '%22'))
+        self.preamble = preamble.encode('utf-8')
+        self.epilogue = '\r\n--{0}--\r\n'.format(self.boundary).encode('utf-8')
+        self.file_path = file_path
+        self.length = len(self.preamble) + os.path.getsize(file_path) + len(self.epilogue)
+
+    def get_content_type(self) -> str:
+        """
+        this function returns value of Content-Type header for request
+        """
+        return 'multipart/form-data; boundary=' + self.boundary
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        yield self.preamble
+        with open(self.file_path, 'rb') as f:
+            while True:
+                chunk = f.read(self.chunk_size)
+                if not chunk:
+                    break
+                yield chunk
+        yield self.epilogue
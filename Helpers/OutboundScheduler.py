@@ -0,0 +1,208 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+import requests
+from concurrent.futures import Future, ThreadPoolExecutor
+from enum import Enum
+from telebot.apihelper import ApiTelegramException, ApiHTTPException
+from Helpers.Metrics import registry
+from Helpers.RateLimiter import RateLimiter
+
+class MessagePriority(Enum):
+    """
+    This class represents priority of outbound Telegram request. Requests with lower value are sent first
+    """
+    INTERACTIVE = 1  # answers to users actions (menus, commands)
+    BULK = 2  # messages resent from Skype
+
+class OutboundRequest:
+    """
+    This class represents Telegram API call waiting in scheduler
+    """
+    def __init__(self, chat_id, priority:MessagePriority, fn, args, kwargs):
+        self.chat_id = chat_id
+        self.priority = priority
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = Future()
+        self.attempts = 0
+        self.chat_token_taken = False
+
+class OutboundScheduler:
+    """
+    This class represents scheduler of all outbound Telegram API calls.
+    It keeps calls in priority queue, limits their rate with global and per chat token buckets,
+    retries calls after time given by Telegram in 429 errors and retries transient errors with exponential backoff
+    """
+    def __init__(self, rate_limiter:RateLimiter, senders_count:int=8, max_retries:int=5, backoff:float=0.5):
+        """
+        :param rate_limiter: limiter with global and per chat buckets
+        :param senders_count: number of threads which make API calls
+        :param max_retries: max number of retries of one call
+        :param backoff: delay before first retry of transient error in seconds. It's doubled with every retry
+        """
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.counter = itertools.count()
+        self.ready = []  # heap of (priority, number, request)
+        self.delayed = []  # heap of (time when request can be sent, number, request)
+        self.chat_pauses = {}  # chat id -> time until which Telegram asked not to send messages to chat
+        self.condition = threading.Condition()
+        self.senders = ThreadPoolExecutor(max_workers=senders_count, thread_name_prefix='tg-sender')
+        self.free_senders = threading.BoundedSemaphore(senders_count)
+        self.request_time = registry.histogram('telegram_request_seconds', 'Time spent making Telegram API calls')
+        # attempts results: transient errors and rate limited calls are retried, failed calls are not
+        self.results = {result: registry.counter('telegram_requests_total', 'Number of Telegram API call attempts',
+                                                 {'result': result})
+                        for result in ('ok', 'rate_limited', 'transient_error', 'failed')}
+        registry.gauge('telegram_scheduler_queue_depth', 'Number of Telegram API calls waiting in scheduler') \
+            .set_function(lambda: len(self.ready) + len(self.delayed))
+        threading.Thread(target=self.dispatch, name='tg-scheduler', daemon=True).start()
+
+    def submit(self, chat_id, priority:MessagePriority, fn, *args, **kwargs) -> Future:
+        """
+        this function adds API call to queue
+        :param chat_id: chat id the call is made for
+        :param priority: call priority
+        :param fn: function which makes API call
+        :return: future with call result
+        """
+        request = OutboundRequest(chat_id, priority, fn, args, kwargs)
+        self.schedule(request)
+        return request.future
+
+    def call(self, chat_id, priority:MessagePriority, fn, *args, **kwargs):
+        """
+        this function adds API call to queue and waits for its result
+        :param chat_id: chat id the call is made for
+        :param priority: call priority
+        :param fn: function which makes API call
+        :return: call result
+        """
+        return self.submit(chat_id, priority, fn, *args, **kwargs).result()
+
+    def schedule(self, request:OutboundRequest, delay:float=0):
+        """
+        this function puts request into ready or delayed queue
+        :param request: request to schedule
+        :param delay: time in seconds request should wait before it's sent
+        """
+        with self.condition:
+            if delay > 0:
+                heapq.heappush(self.delayed, (time.monotonic() + delay, next(self.counter), request))
+            else:
+                heapq.heappush(self.ready, (request.priority.value, next(self.counter), request))
+            self.condition.notify()
+
+    def get_next_request(self) -> OutboundRequest:
+        """
+        this function waits for request with the highest priority which can be sent now
+        :return: request
+        """
+        with self.condition:
+            while True:
+                now = time.monotonic()
+                while self.delayed and self.delayed[0][0] <= now:
+                    request = heapq.heappop(self.delayed)[2]
+                    heapq.heappush(self.ready, (request.priority.value, next(self.counter), request))
+                if self.ready:
+                    return heapq.heappop(self.ready)[2]
+                self.condition.wait(self.delayed[0][0] - now if self.delayed else None)
+
+    def dispatch(self):
+        """
+        this function takes requests from queue and passes them to senders when limits allow it
+        """
+        while True:
+            # request is taken from queue only when sender is free, so request with higher priority
+            # which comes later isn't queued in executor behind requests waiting for sender
+            self.free_senders.acquire()
+            request = self.get_sendable_request()
+            self.rate_limiter.global_bucket.acquire()
+            self.senders.submit(self.send, request)
+
+    def get_sendable_request(self) -> OutboundRequest:
+        """
+        this function waits for request with the highest priority which chat limits allow to send now.
+        Requests which can't be sent now are moved to delayed queue
+        :return: request
+        """
+        while True:
+            request = self.get_next_request()
+            key = str(request.chat_id)
+            pause = self.chat_pauses.get(key, 0) - time.monotonic()
+            if pause > 0:
+                self.schedule(request, pause)
+                continue
+            self.chat_pauses.pop(key, None)
+            if not request.chat_token_taken:
+                # chat bucket is checked without blocking, so messages to other chats are not delayed
+                request.chat_token_taken = True
+                delay = self.rate_limiter.get_chat_bucket(request.chat_id).reserve()
+                if delay > 0:
+                    self.schedule(request, delay)
+                    continue
+            return request
+
+    def send(self, request:OutboundRequest):
+        """
+        this function sends request on sender thread and frees sender for next request
+        :param request: request to send
+        """
+        try:
+            self.send_request(request)
+        finally:
+            self.free_senders.release()
+
+    def send_request(self, request:OutboundRequest):
+        """
+        this function makes API call and schedules retry if it failed
+        :param request: request to send
+        """
+        try:
+            with self.request_time.span():
+                result = request.fn(*request.args, **request.kwargs)
+            self.results['ok'].inc()
+            request.future.set_result(result)
+            return
+        except ApiTelegramException as e:
+            if e.error_code == 429:
+                retry_after = e.result_json.get('parameters', {}).get('retry_after', 1)
+                self.chat_pauses[str(request.chat_id)] = time.monotonic() + retry_after
+                delay = retry_after
+                self.results['rate_limited'].inc()
+            elif e.error_code >= 500:
+                delay = self.get_backoff(request)
+                self.results['transient_error'].inc()
+            else:
+                self.results['failed'].inc()
+                request.future.set_exception(e)
+                return
+            error = e
+        except (ApiHTTPException, requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+            delay = self.get_backoff(request)
+            self.results['transient_error'].inc()
+            error = e
+        except BaseException as e:
+            self.results['failed'].inc()
+            request.future.set_exception(e)
+            return
+        request.attempts += 1
+        if request.attempts > self.max_retries:
+            self.results['failed'].inc()
+            request.future.set_exception(error)
+            return
+        request.chat_token_taken = False
+        self.schedule(request, delay)
+
+    def get_backoff(self, request:OutboundRequest) -> float:
+        """
+        this function calculates delay before retry of transient error
+        :param request: failed request
+        :return: delay in seconds
+        """
+        return self.backoff * (2 ** request.attempts) * random.uniform(0.8, 1.2)
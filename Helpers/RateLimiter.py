@@ -0,0 +1,77 @@
+import threading
+import time
+from Helpers.LRUCache import LRUCache
+
+class TokenBucket:
+    """
+    This class represents token bucket which allows rate events per second with bursts up to capacity events
+    """
+    def __init__(self, rate:float, capacity:float):
+        """
+        :param rate: number of tokens added per second
+        :param capacity: max number of tokens in bucket
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """
+        this function takes one token from bucket. If bucket is empty token is taken in advance
+        :return: time in seconds caller should wait before using taken token
+        """
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def acquire(self):
+        """
+        this function takes one token from bucket and waits until it can be used
+        """
+        delay = self.reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+class RateLimiter:
+    """
+    This class represents limiter of outbound messages with global and per chat token buckets
+    """
+    def __init__(self, global_rate:float, chat_rate:float, chat_burst:float=1, max_chats:int=10000):
+        """
+        :param global_rate: max number of messages per second to all chats
+        :param chat_rate: max number of messages per second to one chat
+        :param chat_burst: max number of messages which can be sent to one chat at once
+        :param max_chats: max number of chats which buckets are stored
+        """
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.chat_buckets = LRUCache(max_chats)
+        self.lock = threading.Lock()
+
+    def get_chat_bucket(self, chat_id) -> TokenBucket:
+        """
+        this function returns token bucket of chat
+        :param chat_id: chat id
+        :return: chat token bucket
+        """
+        key = str(chat_id)
+        with self.lock:
+            bucket = self.chat_buckets.get(key)
+            if bucket is None:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+                self.chat_buckets.put(key, bucket)
+            return bucket
+
+    def acquire(self, chat_id):
+        """
+        this function waits until message can be sent to chat without exceeding limits
+        :param chat_id: chat id
+        """
+        self.get_chat_bucket(chat_id).acquire()
+        self.global_bucket.acquire()
@@ -1,5 +1,7 @@
-from skpy import SkypeTextMsg, SkypeChat
+import re
+from skpy import SkypeTextMsg
 from Helpers.IOManager import Data
+from Helpers.LRUCache import LRUCache
 
 class ParserOutputData(Data):
     """
@@ -18,32 +20,95 @@ class ParserOutputData(Data):
         return self.group_name == other.group_name and self.sender_id == other.sender_id
 
 
+class TokenTrie:
+    """
+    This class represents prefix tree of tokens which finds the longest token starting at given position of text
+    """
+    def __init__(self, tokens):
+        """
+        :param tokens: tokens to find
+        """
+        self.root = {}
+        for token in tokens:
+            node = self.root
+            for char in token:
+                node = node.setdefault(char, {})
+            node[None] = token  # None key marks the end of token
+
+    def match(self, text:str, start:int, is_token_end=None) -> str:
+        """
+        this function finds the longest token which starts at given position of text
+        :param text: text to find token in
+        :param start: token start position
+        :param is_token_end: function which checks if token can end at given position of text
+        :return: found token or None
+        """
+        node = self.root
+        longest = None
+        for i in range(start, len(text)):
+            node = node.get(text[i])
+            if node is None:
+                break
+            if None in node and (is_token_end is None or is_token_end(text, i + 1)):
+                longest = node[None]
+        return longest
+
+def is_mention_end(text:str, position:int) -> bool:
+    """
+    this function checks if user id in mention can end at given position, so @bob doesn't match user bo
+    """
+    return position == len(text) or not (text[position].isalnum() or text[position] in '_-')
+
 class SkypeMessageParser:
     """
     This class represents message parser for skype bot class instance
     """
+    all_mention = '<at id="*">'
+    mention_pattern = re.compile('@|' + re.escape(all_mention))
+
     def __init__(self, bot_id, command_tokens):
         self.bot_id = bot_id
-        self.command_tokens = command_tokens
+        self.command_tokens = list(command_tokens)
+        self.commands_trie = TokenTrie(self.command_tokens)
+        # text is scanned only at positions where some command can start
+        first_chars = ''.join(set(token[0] for token in self.command_tokens if token))
+        self.command_start_pattern = re.compile('[' + re.escape(first_chars) + ']') if first_chars else None
+        # chat members tries by id of members collection, so trie is built once per chat membership
+        self.members_tries = LRUCache(256)
 
     def get_command_token(self, message:str) -> str:
         """
-        this function retrieves command token from message. Only 1 token can be retrieved in one message
+        this function retrieves command token from message. Only 1 token can be retrieved in one message.
+        If message has several tokens, the first one is retrieved
         :param message: message to find token in
         :return: token value
         """
-        mentioned_token = ''
-        for token in self.command_tokens:
-            if message.find(token) != -1:
-                mentioned_token = token
-                break
-        return mentioned_token
+        if self.command_start_pattern is None:
+            return ''
+        for match in self.command_start_pattern.finditer(message):
+            token = self.commands_trie.match(message, match.start())
+            if token is not None:
+                return token
+        return ''
+
+    def get_members_trie(self, chat_user_ids) -> TokenTrie:
+        """
+        this function returns trie of chat members ids. Trie is built once for every members collection
+        :param chat_user_ids: ids of chat members. Collection must not be changed after it's passed to parser
+        :return: members ids trie
+        """
+        entry = self.members_tries.get(id(chat_user_ids))
+        if entry is None or entry[0] is not chat_user_ids:
+            # collection is kept in entry, so its id can't be reused by other collection while entry exists
+            entry = (chat_user_ids, TokenTrie(list(chat_user_ids) + [self.bot_id]))
+            self.members_tries.put(id(chat_user_ids), entry)
+        return entry[1]
 
-    def parse_chat_message(self, message:SkypeTextMsg, chat:SkypeChat) -> ParserOutputData:
+    def parse_chat_message(self, message:SkypeTextMsg, chat_user_ids) -> ParserOutputData:
         """
         this function parses skype chat message and fills structure ParserOutputData with parsed data
         :param message: skype message object
-        :param chat: skype chat object
+        :param chat_user_ids: ids of chat members
         :return: filled structure with parsed values
         """
         result = ParserOutputData()
@@ -60,13 +125,8 @@ class SkypeMessageParser:
             result.error_msg = 'Bot is not mentioned at the beginning of the message. ' \
                                   'Format is: @Bot @User1 @User2 !file(optional) ... text ...'
             return result
-        user_ids = []
         mentioned_users = []
-        for user_id in chat.userIds:
-            if not user_id == self.bot_id and not user_id == message.userId:
-                user_ids.append(user_id)
-        result.msg = self.extract_mentioned_user_ids(result.msg, user_ids, mentioned_users)
-        result.msg = self.extract_bot_id_from_message(result.msg)
+        result.msg = self.extract_mentioned_user_ids(result.msg, chat_user_ids, message.userId, mentioned_users)
         result.mentioned_user_ids = mentioned_users
         if result.msg.find('!file') != -1:
             result.msg = result.msg.replace('!file', '')
@@ -89,44 +149,52 @@ class SkypeMessageParser:
         """
         # remove whitespaces from left
         message = message.lstrip()
-        return message.find(self.bot_id) == 1
+        return message.startswith(self.bot_id, 1) and not message.startswith(self.bot_id)
 
-    def extract_bot_id_from_message(self, message:str) -> str:
+    def extract_mentioned_user_ids(self, message:str, chat_user_ids, sender_id, mentioned_users:list[str]) -> str:
         """
-        this function removes bot id from message
+        this function removes mentioned users` ids and the first bot mention from message in one pass
         :param message: text message
-        :return: text message with extracted bot id
-        """
-        start = message.find('@' + self.bot_id, 0)
-        if start != -1:
-            message = message[:start] + message[start + len(self.bot_id) + 1:]
-        message = message.lstrip()
-        return message
-
-    def extract_mentioned_user_ids(self, message:str, user_ids, mentioned_users:list[str]) -> str:
-        """
-        this function removes mentioned users` ids from message
-        :param message: text message
-        :param user_ids: all users ids in chat
+        :param chat_user_ids: all users ids in chat
+        :param sender_id: message sender id. Sender can't mention himself
         :param mentioned_users: mentioned users
         :return: text message with extracted mentioned users
         """
         mentioned_users.clear()
-        # special case @all == <at id="*">все</at>
-        all_mention_start = message.find('<at id="*">', 0)
-        all_mentioned_end = message.find('</at>', all_mention_start)
+        trie = self.get_members_trie(chat_user_ids)
+        found = set()
+        parts = []
         full_group = False
-        if all_mention_start != -1 and all_mentioned_end != -1:
-            full_group = True
-            message = message[:all_mention_start] + message[all_mentioned_end + len('</at>'):]
-        for user_id in user_ids:
-            if full_group:
-                mentioned_users.append(user_id)
+        bot_removed = False
+        last = 0
+        position = 0
+        while True:
+            match = self.mention_pattern.search(message, position)
+            if match is None:
+                break
+            start = match.start()
+            if match.group() == '@':
+                user_id = trie.match(message, start + 1, is_mention_end)
+                if user_id is None or user_id == sender_id or (user_id == self.bot_id and bot_removed):
+                    position = start + 1
+                    continue
+                if user_id == self.bot_id:
+                    bot_removed = True
+                else:
+                    found.add(user_id)
+                end = start + 1 + len(user_id)
             else:
-                mention = '@' + user_id
-                start = message.find(mention, 0)
-                if start != -1:
-                    mentioned_users.append(user_id)
-            message = message.replace('@' + user_id, '')
-        message = message.lstrip()
-        return message
+                # special case @all == <at id="*">все</at>
+                end = message.find('</at>', match.end())
+                if full_group or end == -1:
+                    position = match.end()
+                    continue
+                full_group = True
+                end += len('</at>')
+            parts.append(message[last:start])
+            last = position = end
+        parts.append(message[last:])
+        for user_id in chat_user_ids:
+            if user_id != self.bot_id and user_id != sender_id and (full_group or user_id in found):
+                mentioned_users.append(user_id)
+        return ''.join(parts).lstrip()
@@ -0,0 +1,66 @@
+import re
+
+class Statement:
+    """
+    This class represents named parameterized query which is prepared once per DB connection
+    """
+    def __init__(self, name:str, query:str):
+        """
+        :param name: statement name
+        :param query: text of query with $1, $2, ... parameters placeholders
+        """
+        self.name = name
+        self.query = query
+        self.params_count = max([int(n) for n in re.findall(r'\$(\d+)', query)], default=0)
+
+    def get_prepare_query(self) -> str:
+        """
+        this function returns query which prepares statement on server
+        """
+        return 'prepare {0} as {1}'.format(self.name, self.query)
+
+    def get_execute_query(self) -> str:
+        """
+        this function returns query which executes prepared statement. Parameters are passed by driver
+        """
+        if self.params_count == 0:
+            return 'execute ' + self.name
+        return 'execute {0}({1})'.format(self.name, ', '.join(['%s'] * self.params_count))
+
+    def get_cursor_query(self) -> str:
+        """
+        this function returns query text for server side cursor, which can't be declared for prepared statement.
+        Parameters are passed by driver as dict with keys p1, p2, ...
+        """
+        return re.sub(r'\$(\d+)', r'%(p\1)s', self.query)
+
+statements = {statement.name: statement for statement in [
+    # bot chats
+    Statement('select_skype_chats', 'select * from bot_skype_chats'),
+    Statement('select_tg_chats', 'select * from bot_tg_chats'),
+    Statement('select_skype_chat', 'select * from bot_skype_chats where chat_link = $1'),
+    Statement('select_tg_chat', 'select * from bot_tg_chats where chat_link = $1'),
+    Statement('insert_skype_chat', "insert into bot_skype_chats (chat_link, chat_name, language) values($1, $2, 'en')"),
+    Statement('insert_tg_chat', "insert into bot_tg_chats (chat_link, language) values($1, 'en')"),
+    Statement('update_skype_chat_language', 'update bot_skype_chats set language = $1 where chat_link = $2'),
+    Statement('update_tg_chat_language', 'update bot_tg_chats set language = $1 where chat_link = $2'),
+    # system users
+    Statement('select_user_by_tg_id', 'select * from system_user where tg_id = $1'),
+    Statement('select_user_id_by_skype_id', 'select user_id from system_user where skype_id = $1'),
+    Statement('insert_user', 'insert into system_user(skype_id, tg_id) values($1, $2) returning user_id'),
+    # subscriptions
+    Statement('select_subscription_chat', 'select * from skype_chat where chat_link = $1'),
+    Statement('insert_subscription_chat', 'insert into skype_chat(chat_link, chat_name) values($1, $2)'),
+    Statement('insert_subscription', "insert into user_and_skype_chats(user_id, chat_link, is_in_blacklist) "
+                                     "values($1, $2, 'n') returning record_id"),
+    Statement('update_subscription_state', 'update user_and_skype_chats set is_in_blacklist = $1 where record_id = $2'),
+    Statement('delete_subscription', 'delete from user_and_skype_chats where record_id = $1'),
+    Statement('select_user_subscription', 'select c.user_id, chat_link from user_and_skype_chats c '
+                                          'inner join system_user s on c.user_id = s.user_id and s.tg_id = $1 '
+                                          'where chat_link = $2'),
+    Statement('select_user_subscriptions', 'select c.record_id, c.chat_link, s.chat_name from user_and_skype_chats c '
+                                           'inner join skype_chat s on s.chat_link = c.chat_link '
+                                           'where user_id = $1 and c.is_in_blacklist = $2'),
+    Statement('select_all_subscriptions', 'select c.record_id, c.chat_link, s.skype_id, s.tg_id, c.is_in_blacklist '
+                                          'from user_and_skype_chats c inner join system_user s on s.user_id = c.user_id'),
+]}
@@ -0,0 +1,101 @@
+import threading
+
+class IndexedSubscription:
+    """
+    This class represents user's subscription stored in subscription index
+    """
+    __slots__ = ('record_id', 'chat_link', 'skype_id', 'tg_id', 'blacklisted')
+
+    def __init__(self, record_id:int, chat_link:str, skype_id:str, tg_id, blacklisted:bool):
+        self.record_id = record_id
+        self.chat_link = chat_link
+        self.skype_id = skype_id
+        self.tg_id = tg_id
+        self.blacklisted = blacklisted
+
+class SubscriptionIndex:
+    """
+    This class represents in-memory index of subscriptions: chat link -> {skype id -> subscription}
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.chats = {}
+        self.records = {}
+        # number of local changes. It is used to detect changes made while index was reloading
+        self.version = 0
+
+    def load(self, rows, version:int) -> bool:
+        """
+        this function replaces index content with subscriptions loaded from DB
+        :param rows: rows of (record_id, chat_link, skype_id, tg_id, is_in_blacklist)
+        :param version: index version taken before rows were selected
+        :return: True if index was replaced, False if index had been changed while rows were selected
+        """
+        chats = {}
+        records = {}
+        for record_id, chat_link, skype_id, tg_id, is_in_blacklist in rows:
+            sub = IndexedSubscription(record_id, chat_link, skype_id, tg_id, is_in_blacklist == 'y')
+            records[record_id] = sub
+            chats.setdefault(chat_link, {})[skype_id] = sub
+        with self.lock:
+            if version != self.version:
+                return False
+            self.chats = chats
+            self.records = records
+            return True
+
+    def add(self, sub:IndexedSubscription):
+        """
+        this function adds new subscription to index
+        :param sub: subscription
+        """
+        with self.lock:
+            self.version += 1
+            self.records[sub.record_id] = sub
+            self.chats.setdefault(sub.chat_link, {})[sub.skype_id] = sub
+
+    def set_blacklisted(self, record_id:int, blacklisted:bool):
+        """
+        this function changes subscription state
+        :param record_id: subscription record id
+        :param blacklisted: True if subscription is in blacklist, False otherwise
+        """
+        with self.lock:
+            self.version += 1
+            sub = self.records.get(record_id)
+            if sub is not None:
+                sub.blacklisted = blacklisted
+
+    def remove(self, record_id:int):
+        """
+        this function removes subscription from index
+        :param record_id: subscription record id
+        """
+        with self.lock:
+            self.version += 1
+            sub = self.records.pop(record_id, None)
+            if sub is None:
+                return
+            chat_subs = self.chats.get(sub.chat_link, {})
+            if chat_subs.get(sub.skype_id) is sub:
+                del chat_subs[sub.skype_id]
+                if not chat_subs:
+                    del self.chats[sub.chat_link]
+
+    def get_recipients_tg_ids(self, chat_link:str, skype_ids:list[str]) -> list:
+        """
+        this function gets Telegram ids of users who subscribed on skype chat and don't have it in blacklist
+        :param chat_link: skype chat id
+        :param skype_ids: skype ids of users to check
+        :return: list of users Telegram ids
+        """
+        with self.lock:
+            chat_subs = self.chats.get(chat_link)
+            if not chat_subs:
+                return []
+            tg_ids = []
+            for skype_id in dict.fromkeys(skype_ids):
+                sub = chat_subs.get(skype_id)
+                if sub is not None and not sub.blacklisted:
+                    tg_ids.append(sub.tg_id)
+            return tg_ids
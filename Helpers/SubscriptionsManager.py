@@ -1,5 +1,11 @@
+import logging
 import threading
+import time
+import config
 from Helpers.DatabaseManager import DatabaseManager
+from Helpers.SubscriptionIndex import SubscriptionIndex, IndexedSubscription
+
+logger = logging.getLogger(__name__)
 
 class UserSubscriptionRequest:
     """
@@ -8,6 +14,7 @@ class UserSubscriptionRequest:
     def __init__(self):
         self.user_id = ''
         self.user_skype_id = ''
+        self.user_tg_id = ''
         self.skype_group_name = ''
         self.skype_group_id = ''
 
@@ -30,25 +37,48 @@ class SubscriptionsManager(DatabaseManager):
         self.insert_lock = threading.Lock()
         self.update_lock = threading.Lock()
         self.delete_lock = threading.Lock()
+        # subscriptions are changed only by methods below, so index is updated by them.
+        # Periodic refresh picks up changes made outside this process
+        self.index = SubscriptionIndex()
+        self.index_refresh_period = getattr(config, 'subscription_index_refresh_period', 60)
+        self.refresh_index()
+        threading.Thread(target=self.refresh_index_periodically, daemon=True).start()
+
+    def refresh_index(self):
+        """
+        this function reloads subscription index from DB
+        """
+        version = self.index.version
+        rows = self.execute_statement('select_all_subscriptions', fetch=True)
+        if not self.index.load(rows, version):
+            logger.info('subscription index was changed during refresh, refresh skipped')
+
+    def refresh_index_periodically(self):
+        """
+        this function reloads subscription index from DB every index_refresh_period seconds
+        """
+        while True:
+            time.sleep(self.index_refresh_period)
+            try:
+                self.refresh_index()
+            except Exception as e:
+                logger.error('subscription index refresh failed: %s', e)
 
     def add_new_subscription(self, req:UserSubscriptionRequest):
         """
         this function adds new subsctiption to DB
         :param req: filled structure to read data from
         """
-        with self.insert_lock:
+        with self.insert_lock, self.transaction():
             # try to add user's sent skype chat id to chats table.
             # it may be already there because earlier somebody from this chat has already created subscription
-            print(req.user_id, req.user_skype_id, req.skype_group_id, req.skype_group_name, sep=' ')
-            query = "select * from skype_chat where chat_link = '{0}'".format(req.skype_group_id)
-            res = self.execute_query(query, fetch=True)
+            logger.debug('new subscription %s %s %s %s', req.user_id, req.user_skype_id, req.skype_group_id,
+                         req.skype_group_name)
+            res = self.execute_statement('select_subscription_chat', (req.skype_group_id,), fetch=True)
             if not res:
-                query = "insert into skype_chat(chat_link, chat_name) values('{0}','{1}')"\
-                    .format(req.skype_group_id, req.skype_group_name)
-                self.execute_query(query)
-            query = "insert into user_and_skype_chats(user_id, chat_link, is_in_blacklist) values('{0}', '{1}', 'n')"\
-                .format(req.user_id, req.skype_group_id)
-            self.execute_query(query)
+                self.execute_statement('insert_subscription_chat', (req.skype_group_id, req.skype_group_name))
+            record_id = self.execute_statement('insert_subscription', (req.user_id, req.skype_group_id), fetch=True)[0][0]
+        self.index.add(IndexedSubscription(record_id, req.skype_group_id, req.user_skype_id, req.user_tg_id, False))
 
     def change_subscription_state(self, record_id, to_blacklist:bool):
         """
@@ -57,9 +87,8 @@ class SubscriptionsManager(DatabaseManager):
         :param to_blacklist: True if subscription should be added to blacklist, False otherwise
         """
         with self.update_lock:
-            query = "update user_and_skype_chats set is_in_blacklist = '{0}' where record_id = {1}"\
-                .format('y' if to_blacklist else 'n', record_id)
-            self.execute_query(query)
+            self.execute_statement('update_subscription_state', ('y' if to_blacklist else 'n', record_id))
+        self.index.set_blacklisted(int(record_id), to_blacklist)
 
     def delete_subscription(self, record_id):
         """
@@ -67,8 +96,8 @@ class SubscriptionsManager(DatabaseManager):
         :param record_id: subscription record id in DB
         """
         with self.delete_lock:
-            query = "delete from user_and_skype_chats where record_id = {0}".format(record_id)
-            self.execute_query(query)
+            self.execute_statement('delete_subscription', (record_id,))
+        self.index.remove(int(record_id))
 
     def get_user_subscriptions(self, chat_id, from_black_list) -> list[UserSubscription]:
         """
@@ -78,17 +107,24 @@ class SubscriptionsManager(DatabaseManager):
         :return: list of user's subscriptions
         """
         # chat id == user_id in private messages
-        query = "select user_id from system_user where tg_id = '{0}'".format(chat_id)
-        res = self.execute_query(query, fetch=True)
+        res = self.execute_statement('select_user_by_tg_id', (str(chat_id),), fetch=True)
         if not res:  # no subscriptions
             return []
         user_id_in_system = res[0][0]
         subs: list[UserSubscription] = []
-        query = "select c.record_id, c.chat_link, s.chat_name from user_and_skype_chats c " \
-                "inner join skype_chat s on s.chat_link = c.chat_link " \
-                "where user_id = '{0}' and c.is_in_blacklist = '{1}'".format(user_id_in_system, 'y' if from_black_list else 'n')
-        res = self.execute_query(query, fetch=True)
+        res = self.execute_statement('select_user_subscriptions', (user_id_in_system, 'y' if from_black_list else 'n'),
+                                     fetch=True)
         for sub in res:
-            print(sub)
+            logger.debug('subscription %s', sub)
             subs.append(UserSubscription(sub[0], sub[1], sub[2]))
         return subs
+
+    def get_recipients_tg_ids(self, chat_link:str, skype_ids:list[str]) -> list:
+        """
+        this function gets Telegram ids of mentioned users who subscribed on messages from skype chat
+        and who don't have this chat in blacklist
+        :param chat_link: skype chat id
+        :param skype_ids: mentioned users skype ids
+        :return: list of users Telegram ids
+        """
+        return self.index.get_recipients_tg_ids(chat_link, skype_ids)
@@ -0,0 +1,97 @@
+import json
+import os
+import tempfile
+import threading
+from Helpers.LRUCache import LRUCache
+
+class TranslationCache(LRUCache):
+    """
+    This class represents cache of translated texts keyed by (text, source language, target language)
+    with optional on-disk snapshot
+    """
+    def __init__(self, max_size:int, snapshot_path:str=None, snapshot_every:int=50):
+        """
+        :param max_size: max number of cached translations
+        :param snapshot_path: path to snapshot file. Snapshot is not used if None
+        :param snapshot_every: number of new translations after which snapshot is saved
+        """
+        super().__init__(max_size)
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.unsaved = 0
+        self.saving = False  # True if snapshot is being saved by background thread
+        self.snapshot_lock = threading.Lock()
+        self.save_lock = threading.Lock()  # snapshot is saved by one thread at a time
+        self.load()
+
+    def get_translation(self, text:str, source_language:str, target_language:str):
+        """
+        this function returns cached translation
+        :param text: original text
+        :param source_language: language to translate from
+        :param target_language: language to translate to
+        :return: translated text or None if text hasn't been translated yet
+        """
+        return self.get((text, source_language, target_language))
+
+    def add_translation(self, text:str, source_language:str, target_language:str, translation:str):
+        """
+        this function saves translation in cache and starts saving snapshot in background
+        if there are enough new translations
+        :param text: original text
+        :param source_language: language to translate from
+        :param target_language: language to translate to
+        :param translation: translated text
+        """
+        self.put((text, source_language, target_language), translation)
+        if self.snapshot_path is None:
+            return
+        with self.snapshot_lock:
+            self.unsaved += 1
+            should_save = self.unsaved >= self.snapshot_every and not self.saving
+            if should_save:
+                self.saving = True
+        if should_save:
+            # translating thread doesn't wait for disk
+            threading.Thread(target=self.save, name='translation-snapshot', daemon=True).start()
+
+    def load(self):
+        """
+        this function loads translations from snapshot file
+        """
+        if self.snapshot_path is None or not os.path.exists(self.snapshot_path):
+            return
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if not isinstance(records, list) or not all(isinstance(record, list) for record in records):
+                raise ValueError('snapshot should be list of records')
+            for text, source_language, target_language, translation in records:
+                self.put((text, source_language, target_language), translation)
+        except (OSError, TypeError, ValueError):
+            return  # broken snapshot is not a reason to fail bot start
+
+    def save(self):
+        """
+        this function saves cached translations to snapshot file
+        """
+        if self.snapshot_path is None:
+            return
+        with self.save_lock:
+            try:
+                with self.snapshot_lock:
+                    self.unsaved = 0
+                records = [[key[0], key[1], key[2], value] for key, value in self.items()]
+                # temporary file name is unique, so processes which share snapshot don't overwrite each other's file
+                directory, name = os.path.split(os.path.abspath(self.snapshot_path))
+                fd, tmp_path = tempfile.mkstemp(prefix=name + '.', suffix='.tmp', dir=directory)
+                try:
+                    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                        json.dump(records, f, ensure_ascii=False)
+                    os.replace(tmp_path, self.snapshot_path)
+                except BaseException:
+                    os.remove(tmp_path)
+                    raise
+            finally:
+                with self.snapshot_lock:
+                    self.saving = False
@@ -0,0 +1,128 @@
+import argparse
+import hmac
+import ipaddress
+import json
+import config
+import requests
+import telebot
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class WebhookRequestHandler(BaseHTTPRequestHandler):
+    """
+    This class represents handler of one HTTP request with Telegram update
+    """
+    def do_POST(self):
+        webhook = self.server.webhook
+        if self.path != webhook.path:
+            self.send_empty_response(404)
+            return
+        token = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+        if webhook.secret and not hmac.compare_digest(token, webhook.secret):
+            self.send_empty_response(403)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            self.send_empty_response(400)
+            return
+        if length <= 0 or length > webhook.max_body_size:
+            self.send_empty_response(413 if length > 0 else 400)
+            return
+        try:
+            update = telebot.types.Update.de_json(json.loads(self.rfile.read(length).decode('utf-8')))
+        except (ValueError, KeyError, TypeError):
+            self.send_empty_response(400)
+            return
+        # handlers are run by bot threads, so Telegram gets answer without waiting for them
+        webhook.bot.process_new_updates([update])
+        self.send_empty_response(200)
+
+    def send_empty_response(self, code:int):
+        self.send_response(code)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+class WebhookServer:
+    """
+    This class represents HTTP server which receives Telegram updates sent to webhook
+    and passes them to bot handlers
+    """
+    max_body_size = 1024 * 1024
+
+    def __init__(self, bot:telebot.TeleBot, host:str=None, port:int=None, path:str=None, secret:str=None):
+        """
+        :param bot: bot which handlers process updates
+        :param host: address server listens on. Server which listens on non-loopback address requires secret
+        :param port: port server listens on
+        :param path: url path updates are posted to
+        :param secret: secret token Telegram sends in X-Telegram-Bot-Api-Secret-Token header
+        """
+        self.bot = bot
+        self.host = host or getattr(config, 'webhook_host', '127.0.0.1')
+        self.port = port if port is not None else getattr(config, 'webhook_port', 8443)
+        self.path = path or getattr(config, 'webhook_path', '/telegram')
+        self.secret = secret if secret is not None else getattr(config, 'webhook_secret', '')
+        if not self.secret and not is_loopback(self.host):
+            # without secret anybody who can reach the port could post forged updates
+            raise ValueError('webhook_secret is required when webhook listens on ' + self.host)
+        self.server = ThreadingHTTPServer((self.host, self.port), WebhookRequestHandler)
+        self.server.daemon_threads = True
+        self.server.webhook = self
+        self.port = self.server.server_port
+
+    def register(self, url:str):
+        """
+        this function tells Telegram to send updates to webhook
+        :param url: public url of webhook
+        """
+        self.bot.set_webhook(url, secret_token=self.secret or None)
+
+    def serve(self):
+        """
+        this function handles requests until server is stopped
+        """
+        self.server.serve_forever()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+def is_loopback(host:str) -> bool:
+    """
+    this function checks if address is accessible only from this machine
+    :param host: host name or IP address
+    """
+    if host == 'localhost':
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+def replay_updates(updates:list, url:str, secret:str='') -> list[int]:
+    """
+    this function posts recorded updates to webhook, e.g. to test bot offline
+    :param updates: list of updates JSON objects
+    :param url: webhook url
+    :param secret: webhook secret token
+    :return: HTTP status codes of responses
+    """
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    with requests.Session() as session:
+        return [session.post(url, json=update, headers=headers).status_code for update in updates]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Post recorded Telegram updates to local webhook')
+    parser.add_argument('file', help='JSON file with one update or list of updates')
+    parser.add_argument('--url', default='http://127.0.0.1:{0}{1}'.format(getattr(config, 'webhook_port', 8443),
+                                                                        getattr(config, 'webhook_path', '/telegram')))
+    parser.add_argument('--secret', default=getattr(config, 'webhook_secret', ''))
+    args = parser.parse_args()
+    with open(args.file, encoding='utf-8') as f:
+        recorded = json.load(f)
+    if isinstance(recorded, dict):
+        recorded = [recorded]
+    print(replay_updates(recorded, args.url, args.secret))
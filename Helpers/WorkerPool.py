@@ -0,0 +1,115 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from enum import Enum
+from Helpers.Metrics import registry
+
+class OverflowPolicy(Enum):
+    """
+    This class represents what pool does with new task when worker queue is full
+    """
+    QUEUE = 'queue'  # queue is not bounded, task is always added
+    DROP = 'drop'  # task is rejected with PoolOverflowError
+    BLOCK = 'block'  # caller waits until there is free place in queue
+
+class PoolOverflowError(RuntimeError):
+    """
+    This class represents error of task which has been dropped because worker queue is full
+    """
+    pass
+
+class TaskQueue(queue.Queue):
+    """
+    This class represents worker queue which can take task even when it is full
+    """
+    def force_put(self, item):
+        """
+        this function adds item to queue without checking its size
+        :param item: item to add
+        """
+        with self.not_full:
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+class KeyedWorkerPool:
+    """
+    This class represents pool of worker threads where tasks with the same key are always run
+    by the same worker one by one. So tasks of one chat are run in order they were submitted,
+    while tasks of different chats run in parallel
+    """
+    def __init__(self, workers_count:int, name:str, max_queue_size:int=0,
+                 overflow_policy:OverflowPolicy=OverflowPolicy.QUEUE):
+        """
+        :param workers_count: number of worker threads
+        :param name: pool name used in threads names and metrics labels
+        :param max_queue_size: max number of tasks waiting in one worker queue. Not used with QUEUE policy
+        :param overflow_policy: what to do with new task when worker queue is full
+        """
+        assert (workers_count > 0)
+        self.name = name
+        self.overflow_policy = overflow_policy
+        queue_size = 0 if overflow_policy == OverflowPolicy.QUEUE else max_queue_size
+        self.queues = [TaskQueue(queue_size) for i in range(workers_count)]
+        labels = {'pool': name}
+        self.queue_depth = registry.gauge('worker_pool_queue_depth', 'Number of tasks waiting in pool queues', labels)
+        self.task_time = registry.histogram('worker_pool_task_seconds', 'Time spent running pool task', labels)
+        self.wait_time = registry.histogram('worker_pool_wait_seconds', 'Time task waited in pool queue', labels)
+        self.dropped = registry.counter('worker_pool_dropped_total', 'Number of tasks dropped because queue was full',
+                                        labels)
+        self.workers = [threading.Thread(target=self.work, args=(q,), name='{0}-{1}'.format(name, i), daemon=True)
+                        for i, q in enumerate(self.queues)]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, key, fn, *args, **kwargs) -> Future:
+        """
+        this function adds task to queue of worker which runs tasks with given key
+        :param key: task key (e.g. chat id)
+        :param fn: function to run
+        :return: future with function result. With DROP policy future has PoolOverflowError if queue is full
+        """
+        future = Future()
+        task = (future, time.monotonic(), fn, args, kwargs)
+        tasks = self.queues[hash(str(key)) % len(self.queues)]
+        # gauge is increased before task is put, so worker never decreases it below zero
+        self.queue_depth.inc()
+        try:
+            tasks.put(task, block=self.overflow_policy != OverflowPolicy.DROP)
+        except queue.Full:
+            self.queue_depth.dec()
+            self.dropped.inc()
+            future.set_exception(PoolOverflowError('{0} pool queue is full, task {1} dropped'.format(self.name, key)))
+        return future
+
+    def force_submit(self, key, fn, *args, **kwargs) -> Future:
+        """
+        this function adds task to queue of worker which runs tasks with given key even if queue is full.
+        It's used for tasks which must not be dropped and whose caller must not wait (e.g. timer callbacks)
+        :param key: task key (e.g. chat id)
+        :param fn: function to run
+        :return: future with function result
+        """
+        future = Future()
+        self.queue_depth.inc()
+        self.queues[hash(str(key)) % len(self.queues)].force_put((future, time.monotonic(), fn, args, kwargs))
+        return future
+
+    def work(self, tasks:queue.Queue):
+        """
+        this function runs tasks from worker queue
+        :param tasks: worker queue
+        """
+        while True:
+            future, submitted, fn, args, kwargs = tasks.get()
+            self.queue_depth.dec()
+            if not future.set_running_or_notify_cancel():
+                continue
+            started = time.monotonic()
+            self.wait_time.observe(started - submitted)
+            try:
+                future.set_result(fn(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+            self.task_time.observe(time.monotonic() - started)
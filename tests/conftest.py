@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests import modules from repository root, like bots do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
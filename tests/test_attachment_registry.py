@@ -0,0 +1,65 @@
+import threading
+import time
+from Helpers.AttachmentRegistry import AttachmentRegistry, TimerWheel
+
+def create_registry(submit=None) -> AttachmentRegistry:
+    return AttachmentRegistry(TimerWheel(tick=0.01), submit)
+
+def test_timer_is_called_after_delay():
+    wheel = TimerWheel(tick=0.01)
+    called = threading.Event()
+    started = time.monotonic()
+    wheel.schedule(0.1, called.set)
+    assert called.wait(1)
+    assert time.monotonic() - started >= 0.09
+
+def test_cancelled_timer_is_not_called():
+    wheel = TimerWheel(tick=0.01)
+    called = threading.Event()
+    wheel.cancel(wheel.schedule(0.05, called.set))
+    assert not called.wait(0.2)
+
+def test_taken_message_doesnt_expire():
+    registry = create_registry()
+    completed = []
+    registry.add('chat', 'user', 'message', 0.05, completed.append)
+    request = registry.take('chat', 'user')
+    assert request.data == 'message'
+    time.sleep(0.2)
+    assert completed == []
+    assert len(registry) == 0
+
+def test_message_expires_without_file():
+    registry = create_registry()
+    completed = []
+    registry.add('chat', 'user', 'message', 0.05, completed.append)
+    time.sleep(0.2)
+    assert completed == ['message']
+    assert registry.take('chat', 'user') is None
+
+def test_message_is_completed_once_when_take_races_with_expire():
+    for i in range(50):
+        registry = create_registry()
+        completed = []
+        registry.add('chat', 'user', 'message', 0.01, completed.append)
+        time.sleep(0.01)
+        request = registry.take('chat', 'user')
+        if request is not None:
+            request.on_complete(request.data)
+        time.sleep(0.03)
+        assert completed == ['message']
+
+def test_new_message_of_sender_completes_previous_one():
+    registry = create_registry()
+    completed = []
+    registry.add('chat', 'user', 'first', 10, completed.append)
+    registry.add('chat', 'user', 'second', 10, completed.append)
+    assert completed == ['first']
+    assert registry.take('chat', 'user').data == 'second'
+
+def test_expired_message_is_completed_by_submit_function():
+    submitted = []
+    registry = create_registry(lambda chat_id, fn, data: submitted.append((chat_id, data)))
+    registry.add('chat', 'user', 'message', 0.05, lambda data: None)
+    time.sleep(0.2)
+    assert submitted == [('chat', 'message')]
@@ -0,0 +1,34 @@
+import threading
+import time
+from Helpers.MembershipCache import MembershipCache
+
+def test_members_are_loaded_once_until_ttl_is_over():
+    loads = []
+    cache = MembershipCache(lambda chat_id: loads.append(chat_id) or ('a', 'b'), ttl=0.1)
+    assert cache.get_members('chat') == ('a', 'b')
+    assert cache.get_members('chat') == ('a', 'b')
+    assert loads == ['chat']
+    time.sleep(0.15)
+    cache.get_members('chat')
+    assert loads == ['chat', 'chat']
+
+def test_members_loaded_before_invalidation_are_not_cached():
+    members = ['old']
+    loading = threading.Event()
+    invalidated = threading.Event()
+
+    def load(chat_id):
+        result = tuple(members)
+        loading.set()
+        invalidated.wait(1)
+        return result
+
+    cache = MembershipCache(load)
+    thread = threading.Thread(target=cache.get_members, args=('chat',))
+    thread.start()
+    loading.wait(1)
+    members[0] = 'new'
+    cache.invalidate('chat')
+    invalidated.set()
+    thread.join(1)
+    assert cache.get_members('chat') == ('new',)
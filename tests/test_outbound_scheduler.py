@@ -0,0 +1,98 @@
+import threading
+import time
+import pytest
+import requests
+from telebot.apihelper import ApiTelegramException
+from Helpers.OutboundScheduler import OutboundScheduler, MessagePriority
+from Helpers.RateLimiter import RateLimiter, TokenBucket
+
+def create_scheduler(senders_count:int=2, max_retries:int=5, backoff:float=0.01) -> OutboundScheduler:
+    return OutboundScheduler(RateLimiter(1000, 1000, 1000), senders_count, max_retries, backoff)
+
+def telegram_error(code:int, retry_after:int=None) -> ApiTelegramException:
+    result_json = {'ok': False, 'error_code': code, 'description': 'error'}
+    if retry_after is not None:
+        result_json['parameters'] = {'retry_after': retry_after}
+    return ApiTelegramException('sendMessage', None, result_json)
+
+class FailingCall:
+    """
+    This class represents API call which raises given errors before it succeeds
+    """
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = []
+
+    def __call__(self):
+        self.calls.append(time.monotonic())
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+def test_interactive_request_is_sent_before_queued_bulk_requests():
+    scheduler = create_scheduler(senders_count=1)
+    release = threading.Event()
+    order = []
+    blocker = scheduler.submit('blocker', MessagePriority.BULK, release.wait)
+    time.sleep(0.05)
+    bulk = [scheduler.submit(i, MessagePriority.BULK, order.append, 'bulk') for i in range(5)]
+    interactive = scheduler.submit('user', MessagePriority.INTERACTIVE, order.append, 'interactive')
+    release.set()
+    for future in [blocker, interactive] + bulk:
+        future.result(5)
+    assert order[0] == 'interactive'
+
+def test_interactive_request_doesnt_wait_for_busy_senders_queue():
+    scheduler = create_scheduler(senders_count=2)
+    for i in range(30):
+        scheduler.submit(i, MessagePriority.BULK, time.sleep, 0.1)
+    time.sleep(0.02)
+    started = time.monotonic()
+    scheduler.call('user', MessagePriority.INTERACTIVE, lambda: None)
+    assert time.monotonic() - started < 0.5
+
+def test_rate_limited_request_is_retried_after_retry_after():
+    scheduler = create_scheduler()
+    call = FailingCall(telegram_error(429, retry_after=1))
+    assert scheduler.call('chat', MessagePriority.BULK, call) == 'ok'
+    assert len(call.calls) == 2
+    assert call.calls[1] - call.calls[0] >= 0.9
+
+def test_rate_limited_chat_doesnt_delay_other_chats():
+    scheduler = create_scheduler()
+    limited = scheduler.submit('limited', MessagePriority.BULK, FailingCall(telegram_error(429, retry_after=1)))
+    time.sleep(0.05)
+    started = time.monotonic()
+    scheduler.call('other', MessagePriority.BULK, lambda: None)
+    assert time.monotonic() - started < 0.5
+    assert limited.result(5) == 'ok'
+
+@pytest.mark.parametrize('error', [telegram_error(502), requests.exceptions.ConnectionError('reset'),
+                                   requests.exceptions.Timeout('timeout')])
+def test_transient_errors_are_retried_with_backoff(error):
+    scheduler = create_scheduler(backoff=0.05)
+    call = FailingCall(error, error)
+    assert scheduler.call('chat', MessagePriority.BULK, call) == 'ok'
+    assert len(call.calls) == 3
+    # second retry waits about twice as long as the first one
+    assert call.calls[2] - call.calls[1] > call.calls[1] - call.calls[0]
+
+def test_request_fails_when_retries_are_exhausted():
+    scheduler = create_scheduler(max_retries=2)
+    call = FailingCall(*[telegram_error(500) for i in range(5)])
+    with pytest.raises(ApiTelegramException):
+        scheduler.call('chat', MessagePriority.BULK, call)
+    assert len(call.calls) == 3
+
+def test_client_error_is_not_retried():
+    scheduler = create_scheduler()
+    call = FailingCall(telegram_error(400))
+    with pytest.raises(ApiTelegramException):
+        scheduler.call('chat', MessagePriority.BULK, call)
+    assert len(call.calls) == 1
+
+def test_token_bucket_delays_requests_over_rate():
+    bucket = TokenBucket(rate=10, capacity=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.02)
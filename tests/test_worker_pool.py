@@ -0,0 +1,70 @@
+import threading
+import time
+import pytest
+from Helpers.WorkerPool import KeyedWorkerPool, OverflowPolicy, PoolOverflowError
+
+def block_worker(pool:KeyedWorkerPool, key) -> threading.Event:
+    """
+    this function occupies worker of given key until returned event is set
+    """
+    release = threading.Event()
+    pool.submit(key, release.wait)
+    time.sleep(0.05)
+    return release
+
+def test_tasks_with_same_key_run_in_submit_order():
+    pool = KeyedWorkerPool(4, 'test-order')
+    results = []
+    futures = [pool.submit('chat', lambda i=i: (time.sleep(0.001 * (10 - i)), results.append(i))) for i in range(10)]
+    for future in futures:
+        future.result(5)
+    assert results == list(range(10))
+
+def test_tasks_with_different_keys_run_in_parallel():
+    pool = KeyedWorkerPool(2, 'test-parallel')
+    keys = ['a', 'b']
+    # keys are mapped to workers by hash, so pick two keys which go to different workers
+    while hash(str(keys[0])) % 2 == hash(str(keys[1])) % 2:
+        keys[1] += 'b'
+    release = block_worker(pool, keys[0])
+    assert pool.submit(keys[1], lambda: 'done').result(1) == 'done'
+    release.set()
+
+def test_task_exception_is_set_to_future():
+    pool = KeyedWorkerPool(1, 'test-exception')
+    with pytest.raises(ZeroDivisionError):
+        pool.submit('chat', lambda: 1 / 0).result(1)
+    assert pool.submit('chat', lambda: 'next').result(1) == 'next'
+
+def test_drop_policy_rejects_task_when_queue_is_full():
+    pool = KeyedWorkerPool(1, 'test-drop', max_queue_size=1, overflow_policy=OverflowPolicy.DROP)
+    release = block_worker(pool, 'chat')
+    queued = pool.submit('chat', lambda: 'queued')
+    dropped = pool.submit('chat', lambda: 'dropped')
+    with pytest.raises(PoolOverflowError):
+        dropped.result(1)
+    release.set()
+    assert queued.result(1) == 'queued'
+
+def test_block_policy_waits_for_free_place_in_queue():
+    pool = KeyedWorkerPool(1, 'test-block', max_queue_size=1, overflow_policy=OverflowPolicy.BLOCK)
+    release = block_worker(pool, 'chat')
+    pool.submit('chat', lambda: 'queued')
+    submitted = threading.Event()
+
+    def submit():
+        pool.submit('chat', lambda: 'blocked')
+        submitted.set()
+
+    threading.Thread(target=submit, daemon=True).start()
+    assert not submitted.wait(0.2)
+    release.set()
+    assert submitted.wait(1)
+
+def test_force_submit_adds_task_to_full_queue():
+    pool = KeyedWorkerPool(1, 'test-force', max_queue_size=1, overflow_policy=OverflowPolicy.BLOCK)
+    release = block_worker(pool, 'chat')
+    pool.submit('chat', lambda: 'queued')
+    forced = pool.force_submit('chat', lambda: 'forced')
+    release.set()
+    assert forced.result(1) == 'forced'